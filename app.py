@@ -1,12 +1,35 @@
+# Skript vaqti importlardan oldin boshlanadi: birinchi ishga tushishda importlar ham hisobga olinadi
+from instrumentation import metrics, start_stage
+_finish_run = start_stage("ui_run")
+
 import streamlit as st
-from subtitler import generate_subtitles, translate_subtitles, burn_subtitles
+from subtitler import (
+    generate_subtitles, translate_subtitles, burn_subtitles, transcription_options,
+    translate_subtitles_multi, burn_subtitle_tracks,
+    transcribe_segments, transcribe_parts_parallel, merge_part_segments,
+    default_worker_count, write_srt, transcribe_long_media,
+    lookup_cached_subtitles, store_cached_subtitles,
+    choose_split_points, get_ffmpeg_path, get_media_info, get_media_duration, run_ffmpeg,
+)
+from model_registry import get_registry, preload_models, resolve_quantize
+from vad import resolve_vad
+from translation_memory import get_translation_memory
+from uploads import save_upload
+from cues import parse_srt_text, write_srt as write_cues_srt
+from jobs import get_job_manager, JobCancelled, QUEUED, DONE, FAILED, CANCELLED
+from workspace import get_workspace
+from file_server import get_file_server
+import settings
+import logging
 import os
 import tempfile
 import math
-import subprocess
 import uuid
+import time
 from datetime import datetime
 
+logging.basicConfig(level=settings.LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
 # Server konfiguratsiyasi - fayl yuklash cheklovini o'chirish
 st.set_page_config(
     page_title="O‘zbekcha Subtitl Tarjimon", 
@@ -73,6 +96,8 @@ SUPPORTED_LANGS = {
     "Hindcha": "hi"
 }
 
+LANG_NAMES = {code: name for name, code in SUPPORTED_LANGS.items()}
+
 # Whisper modellari
 WHISPER_MODELS = {
     "Tiny (engil, tez, kam aniqlik)": "tiny",
@@ -82,6 +107,27 @@ WHISPER_MODELS = {
     "Large (eng yuqori aniqlik)": "large"
 }
 
+# Katta videolar uchun ishlash usullari
+LARGE_VIDEO_MODES = {
+    "Parallel qismlar (tez)": "parallel",
+    "Ketma-ket qismlar": "sequential",
+    "Uzluksiz oyna (kam xotira, uzun videolar uchun)": "window"
+}
+
+# Subtitl biriktirish usullari va qattiq biriktirish profillari
+BURN_MODES = {
+    "Yumshoq subtitl (bir necha soniya, pleyerda yoqib-o'chiriladi)": "soft",
+    "Qattiq subtitl (kadrlarga yoziladi, qayta kodlanadi)": "hard",
+    "Qattiq subtitl, parallel bo'laklarda (uzun videolar uchun tezroq)": "segmented",
+    "Qattiq subtitl, faqat o'zgargan qismlar (tahrirdan keyin qayta biriktirish)": "incremental"
+}
+BURN_PROFILE_NAMES = {
+    "Tez": "fast",
+    "Muvozanatli": "balanced",
+    "Yuqori sifat": "quality",
+    "Ko'rib chiqish (720p, eng tez)": "preview"
+}
+
 # ================== YANGI FUNKSIYALAR ==================
 
 def generate_unique_filename(original_filename, prefix=""):
@@ -108,6 +154,26 @@ def get_safe_filename(filename):
     # Qirqib olish (juda uzun nomlardan qochish)
     return safe_name[:50]  # Maksimum 50 belgi
 
+def save_uploaded_file(uploaded_file, prefix):
+    """Yuklangan faylni diskka bo'laklab yozish va (yo'l, hajm, xesh) qaytarish.
+    
+    Streamlit har bir rerunda skriptni qayta ishga tushiradi, shuning uchun
+    bir marta yozilgan fayl sessiyada eslab qolinadi va qayta yozilmaydi.
+    """
+    if "uploads" not in st.session_state:
+        st.session_state.uploads = {}
+    
+    file_id = getattr(uploaded_file, "file_id", None) or f"{uploaded_file.name}:{uploaded_file.size}"
+    key = f"{prefix}:{file_id}"
+    stored = st.session_state.uploads.get(key)
+    if stored and os.path.exists(stored.path):
+        return stored
+    
+    filename = get_safe_filename(generate_unique_filename(uploaded_file.name, prefix))
+    stored = save_upload(uploaded_file, os.path.join(session_dir(), filename))
+    st.session_state.uploads[key] = stored
+    return stored
+
 def get_file_size_mb(file_path):
     """Fayl hajmini MB da qaytaradi"""
     if os.path.exists(file_path):
@@ -115,6 +181,30 @@ def get_file_size_mb(file_path):
         return size_bytes / (1024 * 1024)
     return 0
 
+def describe_media(video_path, content_hash=None):
+    """Video haqida qisqa ma'lumot (davomiylik, o'lcham, kodeklar); aniqlab bo'lmasa None.
+    
+    Faqat fayl sarlavhasi o'qiladi - skript oqimini to'xtatmaydi; kalit kadrlar
+    fon vazifasida, bo'lish kerak bo'lganda yig'iladi.
+    """
+    info = get_media_info(video_path, content_hash)
+    if info is None:
+        return None
+    parts = []
+    if info.duration:
+        minutes, seconds = divmod(int(info.duration), 60)
+        parts.append(f"⏱️ {minutes}:{seconds:02d}")
+    if info.video:
+        video = info.video
+        if video["width"] and video["height"]:
+            parts.append(f"{video['width']}x{video['height']}")
+        parts.append(video["codec"] or "?")
+        if video["fps"]:
+            parts.append(f"{video['fps']:g} fps")
+    if info.audio:
+        parts.append(f"🔊 {info.audio['codec'] or '?'}")
+    return " · ".join(parts)
+
 def get_file_size_kb(file_path):
     """Fayl hajmini KB da qaytaradi"""
     if os.path.exists(file_path):
@@ -122,130 +212,344 @@ def get_file_size_kb(file_path):
         return size_bytes / 1024
     return 0
 
+def session_dir():
+    """Joriy sessiyaning alohida ishchi katalogi (boshqa sessiyalar fayllariga tegilmaydi)"""
+    return get_workspace().session_dir(st.session_state.session_id)
+
 def cleanup_temp_files():
-    """Vaqtinchalik fayllarni tozalash"""
-    # Session statedagi barcha fayllarni o'chirish
+    """Joriy sessiyaning vaqtinchalik fayllarini tozalash"""
+    get_workspace().clear_session(st.session_state.session_id)
+
+def touch_session_files():
+    """Sessiyada ishlatilayotgan fayllarni yaqinda ishlatilgan deb belgilash (tozalovchi o'chirmasligi uchun)"""
+    paths = [session_dir(), st.session_state.current_video, st.session_state.current_srt]
     for file_type in ["video_files", "srt_files"]:
-        if file_type in st.session_state:
-            for key, file_path in st.session_state[file_type].items():
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                except:
-                    pass
-    
-    # Qo'shimcha vaqtinchalik fayllarni tozalash
-    temp_files = [f for f in os.listdir('.') if f.endswith(('.mp4', '.srt', '.wav')) and not f.startswith('.')]
-    for file in temp_files:
-        try:
-            if os.path.exists(file):
-                os.remove(file)
-        except:
-            pass
-
-def split_large_video(video_path, max_size_mb=190):
-    """Katta videoni qismlarga bo'lish"""
+        paths.extend(st.session_state[file_type].values())
+    paths.extend(stored.path for stored in st.session_state.get("uploads", {}).values())
+    get_workspace().touch(*paths)
+
+def log_to_streamlit(message, level="info"):
+    """Xabarni Streamlit elementi sifatida ko'rsatish (info, warning, error)"""
+    getattr(st, level)(message)
+
+def split_large_video(video_path, max_size_mb=190, log=log_to_streamlit, out_dir=None, content_hash=None):
+    """Katta videoni kalit kadrlar bo'yicha qismlarga bo'lish.
+    
+    (qismlar, boshlanish vaqtlari, rejalashtirilgan qismlar soni) qaytaradi;
+    qismlardan biri yaratilmasa, ro'yxatlar rejadan qisqa bo'ladi.
+    """
     try:
         # Video hajmini o'lchash
         file_size_mb = get_file_size_mb(video_path)
         
         if file_size_mb <= max_size_mb:
-            return [video_path]  # Bo'lish shart emas
+            return [video_path], [0.0], 1  # Bo'lish shart emas
         
-        st.warning(f"Video {file_size_mb:.1f} MB - qismlarga bo'linmoqda...")
+        log(f"Video {file_size_mb:.1f} MB - qismlarga bo'linmoqda...", "warning")
         
-        # Video davomiyligini o'lchash
-        cmd = [
-            "ffprobe", "-v", "error", "-show_entries", "format=duration",
-            "-of", "default=noprint_wrappers=1:nokey=1", video_path
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=30)
-        duration = float(result.stdout.strip())
+        # Davomiylik va kalit kadrlar (keshlangan)
+        info = get_media_info(video_path, content_hash, keyframes=True)
+        if info is None or not info.duration:
+            raise Exception("Video davomiyligini aniqlab bo'lmadi")
+        duration = info.duration
         
         # Qismlar sonini hisoblash
         num_parts = math.ceil(file_size_mb / max_size_mb)
-        part_duration = duration / num_parts
+        # Nusxalab kesish kalit kadrdan boshlanadi: chegaralar kalit kadrlarga to'g'rilansa,
+        # qismlar boshlanish vaqtlari aniq bo'ladi va subtitllar siljimaydi
+        if info.keyframes:
+            points = choose_split_points(info.keyframes, duration, num_parts)
+        else:
+            points = [duration * i / num_parts for i in range(num_parts + 1)]
+        num_parts = len(points) - 1
         
         parts = []
-        temp_dir = tempfile.mkdtemp()
+        offsets = []
+        temp_dir = tempfile.mkdtemp(dir=out_dir)
         
-        for i in range(num_parts):
-            start_time = i * part_duration
+        for i, (start_time, end_time) in enumerate(zip(points, points[1:])):
             output_path = os.path.join(temp_dir, f"part_{i+1}.mp4")
             
             cmd = [
-                "ffmpeg", "-y", "-ss", str(start_time), "-i", video_path,
-                "-t", str(part_duration), "-c", "copy", output_path
+                get_ffmpeg_path(), "-y", "-ss", f"{start_time:.6f}", "-i", video_path,
+                "-t", f"{end_time - start_time:.6f}", "-c", "copy", output_path
             ]
             
             try:
-                subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=300)
+                run_ffmpeg(cmd, timeout=300)
                 parts.append(output_path)
-                st.info(f"Qism {i+1}/{num_parts} yaratildi")
+                offsets.append(start_time)
+                log(f"Qism {i+1}/{num_parts} yaratildi")
+            except JobCancelled:
+                raise
             except Exception as e:
-                st.error(f"Qism {i+1} ni yaratishda xatolik: {str(e)}")
+                log(f"Qism {i+1} ni yaratishda xatolik: {str(e)}", "error")
                 break
         
-        return parts
+        return parts, offsets, num_parts
     
+    except JobCancelled:
+        raise
     except Exception as e:
-        st.error(f"Video bo'lishda xatolik: {str(e)}")
-        return [video_path]  # Agar bo'lish mumkin bo'lmasa, butun video bilan ishlash
+        log(f"Video bo'lishda xatolik: {str(e)}", "error")
+        return [video_path], [0.0], 1  # Agar bo'lish mumkin bo'lmasa, butun video bilan ishlash
 
-def process_large_video(video_path, model_size, progress_callback):
+def process_large_video(video_path, model_size, progress_callback, mode="parallel", content_hash=None, log=log_to_streamlit,
+                        quantize=None, vad=None, out_dir=None):
     """Katta videoni qismlab ishlash"""
     try:
-        parts = split_large_video(video_path)
+        # Bir xil video, model va usul uchun avval yaratilgan natija
+        cached_srt, cache_key = lookup_cached_subtitles(
+            video_path, model_size, transcription_options(mode, quantize, vad), content_hash, out_dir)
+        if cached_srt:
+            log("Natija keshdan olindi")
+            final_srt = os.path.join(out_dir or tempfile.gettempdir(), generate_unique_filename("combined_subtitles.srt", "subtitles"))
+            os.replace(cached_srt, final_srt)
+            progress_callback(100)
+            return final_srt
+        
+        if mode == "window":
+            # Video qismlarga bo'linmaydi: audio bir marta ajratilib, oynalar bilan o'qiladi
+            log("Audio 30 soniyalik oynalar bilan transkripsiya qilinmoqda...")
+            # Davomiylik progress hisobi uchun: yuklashda keshga olingan ma'lumotdan
+            segments = transcribe_long_media(video_path, model_size, progress_callback,
+                                             duration=get_media_duration(video_path, content_hash),
+                                             quantize=quantize, vad=vad)
+            if not segments:
+                return None
+            final_srt = os.path.join(out_dir or tempfile.gettempdir(), generate_unique_filename("combined_subtitles.srt", "subtitles"))
+            write_srt(segments, final_srt)
+            store_cached_subtitles(cache_key, final_srt)
+            progress_callback(100)
+            return final_srt
+        
+        parts, offsets, planned_parts = split_large_video(video_path, log=log, out_dir=out_dir,
+                                                          content_hash=content_hash)
+        incomplete = len(parts) < planned_parts
+        if incomplete:
+            log(f"Faqat {len(parts)}/{planned_parts} ta qism yaratildi - subtitllar to'liq bo'lmaydi", "warning")
         
         if len(parts) == 1:
             # Video katta emas, oddiy ishlash
-            return generate_subtitles(video_path, model_size, progress_callback)
+            return generate_subtitles(video_path, model_size, progress_callback, content_hash, quantize, vad=vad,
+                                      out_dir=out_dir)
         
-        all_subtitles = []
         total_parts = len(parts)
         
-        for i, part_path in enumerate(parts):
-            progress = (i / total_parts) * 50
-            progress_callback(progress)
-            
-            st.info(f"Qism {i+1}/{total_parts} ishlanmoqda...")
-            
-            try:
-                part_srt = generate_subtitles(part_path, model_size, lambda p: None)
+        if mode == "parallel":
+            workers = default_worker_count(model_size, total_parts, quantize)
+            log(f"{total_parts} ta qism {workers} ta jarayonda parallel ishlanmoqda...")
+            segments, errors = transcribe_parts_parallel(
+                parts, offsets, model_size, max_workers=workers,
+                progress_callback=progress_callback, quantize=quantize, vad=vad)
+            for i, error in errors:
+                log(f"Qism {i+1} da xatolik: {error}", "error")
+        else:
+            part_segments = []
+            errors = []
+            for i, part_path in enumerate(parts):
+                progress = int((i / total_parts) * 95)
+                progress_callback(progress)
                 
-                with open(part_srt, 'r', encoding='utf-8') as f:
-                    all_subtitles.append(f.read())
+                log(f"Qism {i+1}/{total_parts} ishlanmoqda...")
                 
-                # Vaqtinchalik fayllarni tozalash
                 try:
-                    os.remove(part_path)
-                    os.remove(part_srt)
-                except:
-                    pass
-                
-            except Exception as e:
-                st.error(f"Qism {i+1} da xatolik: {str(e)}")
-                continue
-        
-        # Barcha subtitllarni birlashtirish
-        if all_subtitles:
-            final_srt = generate_unique_filename("combined_subtitles.srt", "subtitles")
-            with open(final_srt, 'w', encoding='utf-8') as f:
-                for i, subtitle in enumerate(all_subtitles):
-                    if i > 0:
-                        f.write("\n")
-                    f.write(subtitle)
+                    part_segments.append(transcribe_segments(part_path, model_size, quantize=quantize, vad=vad))
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    log(f"Qism {i+1} da xatolik: {str(e)}", "error")
+                    errors.append((i, str(e)))
+                    part_segments.append(None)
+            segments = merge_part_segments(part_segments, offsets)
+        
+        # Vaqtinchalik fayllarni tozalash
+        for part_path in parts:
+            try:
+                os.remove(part_path)
+            except:
+                pass
+        
+        # Barcha subtitllarni birlashtirish (vaqtlar siljitilgan, raqamlar qayta tartiblangan)
+        if segments:
+            final_srt = os.path.join(out_dir or tempfile.gettempdir(), generate_unique_filename("combined_subtitles.srt", "subtitles"))
+            write_srt(segments, final_srt)
+            # Qismlardan biri yaratilmagan yoki xato bilan tugagan bo'lsa, to'liq bo'lmagan natija keshlanmaydi
+            if not errors and not incomplete:
+                store_cached_subtitles(cache_key, final_srt)
             
             progress_callback(100)
             return final_srt
         
         return None
     
+    except JobCancelled:
+        raise
     except Exception as e:
-        st.error(f"Katta video ishlashda xatolik: {str(e)}")
+        log(f"Katta video ishlashda xatolik: {str(e)}", "error")
         return None
 
+# ================== FON VAZIFALARI ==================
+
+def run_transcription_job(job, video_path, model_size, large, mode, content_hash, quantize=None, vad=None,
+                          out_dir=None):
+    """Subtitl yaratish vazifasi (fonda bajariladi)"""
+    if large:  # Streamlit Cloud cheklovi
+        job.log("Katta video - maxsus usul bilan ishlanmoqda...")
+        return process_large_video(video_path, model_size, job.progress_callback, mode, content_hash, log=job.log,
+                                   quantize=quantize, vad=vad, out_dir=out_dir)
+    return generate_subtitles(video_path, model_size, job.progress_callback, content_hash, quantize, vad=vad,
+                              out_dir=out_dir)
+
+def run_translation_job(job, srt_path, lang, state_path=None, out_dir=None):
+    """Tarjima vazifasi (fonda bajariladi)"""
+    return translate_subtitles(srt_path, lang, job.progress_callback, state_path=state_path, out_dir=out_dir)
+
+def run_multi_translation_job(job, srt_path, langs, state_paths, video_path=None, out_dir=None):
+    """Bir nechta tilga tarjima va (ixtiyoriy) barcha tillar treklari bilan video vazifasi"""
+    try:
+        srt_paths = translate_subtitles_multi(srt_path, langs, job.progress_callback, state_paths=state_paths,
+                                              out_dir=out_dir)
+    except Exception:
+        # Bekor qilish tarjima oqimlarida xatolik sifatida ko'rinadi
+        job.check_cancelled()
+        raise
+    job.check_cancelled()
+    for lang in langs:
+        if lang not in srt_paths:
+            job.log(f"{LANG_NAMES.get(lang, lang)} tiliga tarjima qilib bo'lmadi", "warning")
+    
+    video = None
+    if video_path:
+        job.log("Subtitl treklari videoga qo'shilmoqda (qayta kodlashsiz)...")
+        tracks = [(path, lang, LANG_NAMES.get(lang, lang)) for lang, path in srt_paths.items()]
+        video = burn_subtitle_tracks(video_path, tracks, out_dir)
+        if video is None:
+            raise Exception("Subtitl treklarini videoga qo'shib bo'lmadi")
+    return {"srts": srt_paths, "video": video}
+
+def translation_state_path(lang):
+    """Sessiyadagi shu til tarjimasining holat fayli (qayta tarjimada o'zgarmaganlar qayta yuborilmaydi)"""
+    states = st.session_state.translation_states
+    if lang not in states:
+        states[lang] = os.path.join(session_dir(), generate_unique_filename(f"translation_{lang}.json", "state"))
+    return states[lang]
+
+def run_burn_job(job, video_path, srt_path, mode="hard", profile="balanced", remove_srt=False, content_hash=None,
+                 out_dir=None):
+    """Videoga subtitl biriktirish vazifasi (fonda bajariladi)"""
+    try:
+        return burn_subtitles(video_path, srt_path, mode, profile, content_hash=content_hash, out_dir=out_dir)
+    finally:
+        if remove_srt:
+            try:
+                os.remove(srt_path)
+            except:
+                pass
+
+def select_burn_options(key, default="soft"):
+    """Biriktirish usuli va profilini tanlash; (usul, profil) qaytaradi"""
+    mode_name = st.radio("Biriktirish usuli:", list(BURN_MODES.keys()),
+                         index=list(BURN_MODES.values()).index(default), key=f"{key}_mode")
+    mode = BURN_MODES[mode_name]
+    profile = "balanced"
+    if mode in ("hard", "segmented", "incremental"):
+        profile_name = st.selectbox(
+            "Kodlash profili:", list(BURN_PROFILE_NAMES.keys()), index=1, key=f"{key}_profile",
+            help="Tez profillar kamroq vaqt oladi, lekin fayl hajmi kattaroq yoki sifati pastroq bo'ladi."
+        )
+        profile = BURN_PROFILE_NAMES[profile_name]
+    return mode, profile
+
+def run_in_workspace(job, session_id, target, *args):
+    """Vazifani o'z katalogida bajarish; natija fayllari shu katalogga yoziladi"""
+    with get_workspace().job(session_id, job.id) as out_dir:
+        return target(job, *args, out_dir=out_dir)
+
+def submit_job(job_key, kind, target, *args):
+    """Vazifani umumiy navbatga qo'yish va sessiyada eslab qolish"""
+    # Shu joydagi avvalgi tugallanmagan vazifa endi kerak emas
+    previous = st.session_state.jobs.get(job_key)
+    if previous:
+        get_job_manager().cancel(previous)
+    st.session_state.jobs[job_key] = get_job_manager().submit(
+        kind, run_in_workspace, st.session_state.session_id, target, *args)
+
+def render_job(job_key, label):
+    """Sessiyadagi vazifa holatini ko'rsatish; vazifa obyektini qaytaradi"""
+    global jobs_running
+    
+    job_id = st.session_state.jobs.get(job_key)
+    if not job_id:
+        return None
+    job = get_job_manager().get(job_id)
+    if job is None:
+        del st.session_state.jobs[job_key]
+        return None
+    
+    for level, message in job.messages:
+        getattr(st, level, st.info)(message)
+    
+    if job.status == DONE:
+        st.progress(1.0, text=f"{label} tayyor!")
+        st.markdown(
+            f"<div style='text-align:center;font-size:18px;color:#059669;'><b>{label} tayyor! 100%</b></div>",
+            unsafe_allow_html=True)
+    elif job.status == FAILED:
+        st.error(f"Xatolik yuz berdi: {job.error}")
+    elif job.status == CANCELLED:
+        st.warning("Vazifa bekor qilindi.")
+    else:
+        text = "Navbatda kutilmoqda..." if job.status == QUEUED else f"{label}... {job.progress}%"
+        st.progress(job.progress / 100, text=text)
+        st.markdown(
+            f"<div style='text-align:center;font-size:18px;color:#2563eb;'>"
+            f"<b>Jarayon:</b> {job.progress}%</div>", unsafe_allow_html=True)
+        if job.cancel_requested:
+            st.info("Bekor qilinmoqda...")
+        elif st.button("⏹️ Bekor qilish", key=f"cancel_{job_key}", use_container_width=True):
+            get_job_manager().cancel(job_id)
+        jobs_running = True
+    
+    if job.finished and job.trace_path and os.path.exists(job.trace_path):
+        with open(job.trace_path, "rb") as f:
+            st.download_button(
+                "⏱️ Bosqichlar vaqti (Chrome trace)", f.read(),
+                file_name=f"trace_{job.kind}_{job.id}.json", mime="application/json",
+                key=f"trace_{job_key}_{job.id}"
+            )
+    
+    return job
+
+def render_file_download(path, label, file_name):
+    """Natija faylini yuklab olish: katta fayllar diskdan havola orqali, kichiklari Streamlit orqali.
+    
+    st.download_button butun faylni server xotirasiga o'qiydi; havolada esa
+    fayl to'g'ridan-to'g'ri diskdan beriladi va uzilgan yuklab olish davom ettiriladi.
+    """
+    server = get_file_server() if get_file_size_mb(path) >= settings.FILE_LINK_MIN_MB else None
+    if server is None:
+        with open(path, "rb") as f:
+            st.download_button(label, f, file_name=file_name, use_container_width=True)
+        return
+    
+    # Har bir rerunda yangi havola yaratilmaydi; muddati tugashiga oz qolganda yangilanadi
+    link = st.session_state.file_links.get(path)
+    if link is None or link[1] - time.time() < 300:
+        link = server.register(path, file_name)
+        st.session_state.file_links[path] = link
+    url, expires = link
+    st.link_button(label, url, use_container_width=True)
+    st.caption(f"🔗 Havola {datetime.fromtimestamp(expires).strftime('%H:%M')} gacha amal qiladi. "
+               "Yuklab olish uzilsa, brauzer uni davom ettira oladi.")
+
+def job_result_is_new(job):
+    """Vazifa natijasi sessiyada hali qo'llanilmaganmi (bir marta qo'llash uchun)"""
+    if job.id in st.session_state.applied_jobs:
+        return False
+    st.session_state.applied_jobs.add(job.id)
+    return True
+
 # ================== ASOSIY KOD ==================
 
 tab1, tab2, tab3, tab4 = st.tabs([
@@ -264,9 +568,25 @@ if "current_video" not in st.session_state:
     st.session_state.current_video = None
 if "current_srt" not in st.session_state:
     st.session_state.current_srt = None
+if "jobs" not in st.session_state:
+    st.session_state.jobs = {}
+if "applied_jobs" not in st.session_state:
+    st.session_state.applied_jobs = set()
+if "translation_states" not in st.session_state:
+    st.session_state.translation_states = {}
+if "file_links" not in st.session_state:
+    st.session_state.file_links = {}
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Eski fayllarni fon oqimi tozalaydi; bu sessiya fayllari esa yangi deb belgilanadi
+touch_session_files()
+
+# Shu rerunda tugallanmagan vazifa bormi (oxirida sahifani yangilash uchun)
+jobs_running = False
 
-# Dastur boshlanganda vaqtinchalik fayllarni tozalash
-cleanup_temp_files()
+# Tanlangan Whisper modellarini fonda oldindan yuklash (jarayonda bir marta)
+preload_models(settings.PRELOAD_MODELS)
 
 with tab1:
     st.markdown("#### 📥 Videoni yuklang va subtitl yarating")
@@ -280,6 +600,28 @@ with tab1:
     )
     model_size = WHISPER_MODELS[model_name]
     
+    large_mode_name = st.radio(
+        "Katta videolar uchun ishlash usuli:",
+        options=list(LARGE_VIDEO_MODES.keys()),
+        index=0,
+        help="Parallel qismlar barcha protsessor yadrolaridan foydalanadi (ko'proq xotira talab qiladi). "
+             "Uzluksiz oyna videoni qismlarga bo'lmaydi va xotira sarfi video uzunligiga bog'liq emas."
+    )
+    large_mode = LARGE_VIDEO_MODES[large_mode_name]
+    
+    use_int8 = st.checkbox(
+        "⚡ CPU uchun int8 kvantlash", value=resolve_quantize() == "int8",
+        help="Modelning chiziqli qatlamlari int8 ga o'tkaziladi: protsessorda sezilarli tezroq, "
+             "aniqlik biroz pasayishi mumkin. GPU bo'lmagan serverlar uchun."
+    )
+    quantize = "int8" if use_int8 else "none"
+    
+    use_vad = st.checkbox(
+        "🔇 Sukunatni o'tkazib yuborish (VAD)", value=resolve_vad(),
+        help="Modelga faqat nutq bor qismlar yuboriladi: jimjit joylari ko'p videolar ancha tezroq ishlanadi. "
+             "Juda past ovozli nutq bo'lsa, o'chirib qo'ying."
+    )
+    
     uploaded_video = st.file_uploader(
         "Videoni yuklang (MP4, MOV, AVI)", 
         type=["mp4", "mov", "avi"],
@@ -287,7 +629,11 @@ with tab1:
     )
     
     if uploaded_video:
-        file_size_mb = len(uploaded_video.getvalue()) / (1024 * 1024)
+        # Videoni diskka bo'laklab yozish (hajm va xesh shu o'tishda hisoblanadi)
+        with st.spinner("Video yuklanmoqda..."):
+            stored_video = save_uploaded_file(uploaded_video, "video")
+        safe_video_filename = stored_video.path
+        file_size_mb = stored_video.size / (1024 * 1024)
         
         if file_size_mb > 100:
             st.markdown(f"""
@@ -297,19 +643,14 @@ with tab1:
             </div>
             """, unsafe_allow_html=True)
         
-        # Unikal video nomi yaratish
-        video_filename = generate_unique_filename(uploaded_video.name, "video")
-        safe_video_filename = get_safe_filename(video_filename)
-        
-        with st.spinner("Video yuklanmoqda..."):
-            with open(safe_video_filename, "wb") as f:
-                f.write(uploaded_video.getbuffer())
-        
         # Session statega saqlash
         st.session_state.video_files["current"] = safe_video_filename
         st.session_state.current_video = safe_video_filename
         
         st.success(f"✅ Video yuklandi! Hajmi: {file_size_mb:.1f} MB")
+        media_summary = describe_media(safe_video_filename, stored_video.sha256)
+        if media_summary:
+            st.caption(media_summary)
         st.markdown(f"""
         <div class='file-info'>
             <strong>📁 Fayl nomi:</strong> {safe_video_filename}<br>
@@ -319,65 +660,45 @@ with tab1:
         """, unsafe_allow_html=True)
         
         if st.button("Subtitl yaratish", use_container_width=True):
-            progress_placeholder = st.empty()
-            status_placeholder = st.empty()
-            
-            def progress_callback(p):
-                progress_placeholder.progress(p / 100, text=f"Subtitl yaratilmoqda... {p}%")
-                status_placeholder.markdown(
-                    f"<div style='text-align:center;font-size:18px;color:#2563eb;'>"
-                    f"<b>Jarayon:</b> {p}%</div>", unsafe_allow_html=True)
+            # Fayl hajmini tekshirish va mos usulni tanlash
+            submit_job("transcribe", "transcribe", run_transcription_job,
+                       safe_video_filename, model_size, file_size_mb > 190, large_mode, stored_video.sha256, quantize, use_vad)
+        
+        job = render_job("transcribe", "Subtitl yaratish")
+        if job and job.status == DONE:
+            srt_path = job.result
             
-            try:
-                # Fayl hajmini tekshirish va mos usulni tanlash
-                file_size_mb = get_file_size_mb(safe_video_filename)
-                
-                if file_size_mb > 190:  # Streamlit Cloud cheklovi
-                    st.info("Katta video - maxsus usul bilan ishlanmoqda...")
-                    srt_path = process_large_video(safe_video_filename, model_size, progress_callback)
-                else:
-                    srt_path = generate_subtitles(safe_video_filename, model_size, progress_callback)
+            if srt_path and os.path.exists(srt_path):
+                st.success("✅ Subtitl yaratildi!")
                 
-                progress_placeholder.progress(1.0, text="Subtitl yaratildi!")
-                status_placeholder.markdown(
-                    "<div style='text-align:center;font-size:18px;color:#059669;'><b>Subtitl yaratildi! 100%</b></div>",
-                    unsafe_allow_html=True)
+                # SRT fayl hajmi
+                srt_size_kb = get_file_size_kb(srt_path)
                 
-                if srt_path and os.path.exists(srt_path):
-                    st.success("✅ Subtitl yaratildi!")
-                    
-                    # SRT fayl hajmi
-                    srt_size_kb = get_file_size_kb(srt_path)
-                    
-                    # Session statega saqlash
+                # Session statega saqlash (faqat bir marta)
+                if job_result_is_new(job):
                     st.session_state.srt_files["current"] = srt_path
                     st.session_state.current_srt = srt_path
-                    
-                    with open(srt_path, "r", encoding="utf-8") as f:
-                        srt_content = f.read()
-                    
-                    st.download_button(
-                        f"📥 Subtitlni yuklab olish ({srt_size_kb:.1f} KB)", 
-                        srt_content, 
-                        file_name=os.path.basename(srt_path), 
-                        use_container_width=True
-                    )
-                    
-                    st.markdown(f"""
-                    <div class='file-info'>
-                        <strong>📝 Subtitl fayli:</strong> {os.path.basename(srt_path)}<br>
-                        <strong>📊 Hajmi:</strong> {srt_size_kb:.1f} KB<br>
-                        <strong>✅ Status:</strong> Tayyor
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                else:
-                    st.error("Subtitl yaratishda xatolik.")
-                    
-            except Exception as e:
-                st.error(f"Xatolik yuz berdi: {str(e)}")
-                progress_placeholder.empty()
-                status_placeholder.empty()
+                
+                with open(srt_path, "r", encoding="utf-8") as f:
+                    srt_content = f.read()
+                
+                st.download_button(
+                    f"📥 Subtitlni yuklab olish ({srt_size_kb:.1f} KB)", 
+                    srt_content, 
+                    file_name=os.path.basename(srt_path), 
+                    use_container_width=True
+                )
+                
+                st.markdown(f"""
+                <div class='file-info'>
+                    <strong>📝 Subtitl fayli:</strong> {os.path.basename(srt_path)}<br>
+                    <strong>📊 Hajmi:</strong> {srt_size_kb:.1f} KB<br>
+                    <strong>✅ Status:</strong> Tayyor
+                </div>
+                """, unsafe_allow_html=True)
+                
+            else:
+                st.error("Subtitl yaratishda xatolik.")
 
 with tab2:
     st.markdown("#### 🌐 Subtitlni istalgan tilga tarjima qiling")
@@ -387,13 +708,9 @@ with tab2:
     srt_path = None
     
     if uploaded_srt:
-        # Unikal SRT nomi yaratish
-        srt_filename = generate_unique_filename(uploaded_srt.name, "subtitles")
-        safe_srt_filename = get_safe_filename(srt_filename)
-        
-        srt_path = safe_srt_filename
-        with open(srt_path, "wb") as f:
-            f.write(uploaded_srt.getbuffer())
+        # Unikal nom bilan diskka saqlash
+        srt_path = save_uploaded_file(uploaded_srt, "subtitles").path
+        safe_srt_filename = srt_path
         
         st.session_state.srt_files["uploaded"] = srt_path
         st.session_state.current_srt = srt_path
@@ -415,55 +732,76 @@ with tab2:
 
     if srt_path and os.path.exists(srt_path):
         if st.button("Tarjima qilish", key="translate_btn", use_container_width=True):
-            progress_placeholder = st.empty()
-            status_placeholder = st.empty()
-            
-            def progress_callback(p):
-                progress_placeholder.progress(p / 100, text=f"Tarjima qilinmoqda... {p}%")
-                status_placeholder.markdown(
-                    f"<div style='text-align:center;font-size:18px;color:#2563eb;'>"
-                    f"<b>Jarayon:</b> {p}%</div>", unsafe_allow_html=True)
+            submit_job("translate", "translate", run_translation_job, srt_path, lang, translation_state_path(lang))
+        
+        job = render_job("translate", "Tarjima")
+        if job and job.status == DONE:
+            translated_path = job.result
             
-            try:
-                translated_path = translate_subtitles(srt_path, lang, progress_callback)
+            if translated_path and os.path.exists(translated_path):
+                # Tarjima qilingan fayl nomi
+                translated_filename = generate_unique_filename(f"translated_{lang}.srt", "translated")
                 
-                progress_placeholder.progress(1.0, text="Tarjima tayyor!")
-                status_placeholder.markdown(
-                    "<div style='text-align:center;font-size:18px;color:#059669;'><b>Tarjima tayyor! 100%</b></div>",
-                    unsafe_allow_html=True)
+                with open(translated_path, "r", encoding="utf-8") as f:
+                    translated_content = f.read()
                 
-                if translated_path and os.path.exists(translated_path):
-                    # Tarjima qilingan fayl nomi
-                    translated_filename = generate_unique_filename(f"translated_{lang}.srt", "translated")
-                    
-                    with open(translated_path, "r", encoding="utf-8") as f:
-                        translated_content = f.read()
-                    
-                    st.download_button(
-                        f"🌐 Tarjima qilingan subtitl (.srt)", 
-                        translated_content, 
-                        file_name=translated_filename, 
-                        use_container_width=True
-                    )
-                    
-                    st.session_state.srt_files["translated"] = translated_path
-                    st.success("✅ Tarjima tayyor!")
-                    
-                    st.markdown(f"""
-                    <div class='file-info'>
-                        <strong>🌐 Tarjima tili:</strong> {lang_name}<br>
-                        <strong>📝 Fayl nomi:</strong> {translated_filename}<br>
-                        <strong>✅ Status:</strong> Tarjima tayyor
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                else:
-                    st.error("Tarjimada xatolik.")
-                    
-            except Exception as e:
-                st.error(f"Tarjima xatosi: {str(e)}")
-                progress_placeholder.empty()
-                status_placeholder.empty()
+                st.download_button(
+                    f"🌐 Tarjima qilingan subtitl (.srt)", 
+                    translated_content, 
+                    file_name=translated_filename, 
+                    use_container_width=True
+                )
+                
+                st.session_state.srt_files["translated"] = translated_path
+                st.success("✅ Tarjima tayyor!")
+                
+                st.markdown(f"""
+                <div class='file-info'>
+                    <strong>🌐 Tarjima tili:</strong> {lang_name}<br>
+                    <strong>📝 Fayl nomi:</strong> {translated_filename}<br>
+                    <strong>✅ Status:</strong> Tarjima tayyor
+                </div>
+                """, unsafe_allow_html=True)
+                
+            else:
+                st.error("Tarjimada xatolik.")
+        
+        st.markdown("##### 🌍 Bir nechta tilga birdan")
+        multi_names = st.multiselect(
+            "Tarjima tillari:", list(SUPPORTED_LANGS.keys()), default=["O‘zbekcha", "Ruscha", "Inglizcha"],
+            key="multi_langs", help="Subtitllar bir marta o'qiladi va barcha tillarga parallel tarjima qilinadi."
+        )
+        multi_langs = [SUPPORTED_LANGS[name] for name in multi_names]
+        tracks_video = st.session_state.current_video
+        has_video = bool(tracks_video and os.path.exists(tracks_video))
+        with_tracks = st.checkbox(
+            "🎞️ Barcha tillarni joriy videoga alohida subtitl treklari qilib qo'shish", value=has_video,
+            disabled=not has_video, key="multi_tracks",
+            help="Video qayta kodlanmaydi: har bir til pleyerda tanlanadigan alohida trek bo'ladi."
+        )
+        
+        if multi_langs and st.button("Barcha tillarga tarjima qilish", key="multi_translate_btn",
+                                     use_container_width=True):
+            submit_job("multi_translate", "translate", run_multi_translation_job, srt_path, multi_langs,
+                       {code: translation_state_path(code) for code in multi_langs},
+                       tracks_video if with_tracks and has_video else None)
+        
+        job = render_job("multi_translate", "Ko'p tilli tarjima")
+        if job and job.status == DONE and job.result:
+            for code, path in job.result["srts"].items():
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as f:
+                        st.download_button(
+                            f"🌐 {LANG_NAMES.get(code, code)} (.srt)", f.read(),
+                            file_name=generate_unique_filename(f"translated_{code}.srt", "translated"),
+                            key=f"multi_srt_{code}", use_container_width=True
+                        )
+            multi_video = job.result.get("video")
+            if multi_video and os.path.exists(multi_video):
+                render_file_download(
+                    multi_video, f"🎥 Barcha tillar bilan video ({get_file_size_mb(multi_video):.1f} MB)",
+                    generate_unique_filename(f"video_multilang{os.path.splitext(multi_video)[1]}", "output")
+                )
     else:
         st.info("Avval subtitl yarating yoki yuklang.")
 
@@ -475,13 +813,10 @@ with tab3:
     srt_filename = None
     
     if uploaded_edit_srt:
-        # Unikal SRT nomi yaratish
-        srt_filename = generate_unique_filename(uploaded_edit_srt.name, "edit")
-        safe_srt_filename = get_safe_filename(srt_filename)
-        
-        srt_file = safe_srt_filename
-        with open(srt_file, "wb") as f:
-            f.write(uploaded_edit_srt.getbuffer())
+        # Unikal nom bilan diskka saqlash
+        srt_file = save_uploaded_file(uploaded_edit_srt, "edit").path
+        safe_srt_filename = srt_file
+        srt_filename = os.path.basename(srt_file)
         
         st.session_state.srt_files["edit"] = srt_file
         st.session_state.current_srt = srt_file
@@ -504,6 +839,9 @@ with tab3:
             srt_text = f.read()
         
         edited_srt = st.text_area("Subtitl matni:", value=srt_text, height=300)
+        edited_cues = parse_srt_text(edited_srt)
+        if not edited_cues:
+            st.warning("Matnda birorta ham to'g'ri subtitl topilmadi. Vaqt formatini tekshiring: 00:00:01,000 --> 00:00:02,000")
         
         # Tahrirlangan fayl nomi
         edited_filename = generate_unique_filename("edited_subtitles.srt", "edited")
@@ -522,7 +860,10 @@ with tab3:
         )
         
         if uploaded_edit_video:
-            video_size_mb = len(uploaded_edit_video.getvalue()) / (1024 * 1024)
+            # Videoni diskka bo'laklab yozish
+            stored_edit_video = save_uploaded_file(uploaded_edit_video, "edit_video")
+            temp_video = stored_edit_video.path
+            video_size_mb = get_file_size_mb(temp_video)
             
             if video_size_mb > 100:
                 st.markdown(f"""
@@ -532,60 +873,41 @@ with tab3:
                 </div>
                 """, unsafe_allow_html=True)
             
-            # Unikal video nomi yaratish
-            video_filename = generate_unique_filename(uploaded_edit_video.name, "edit_video")
-            safe_video_filename = get_safe_filename(video_filename)
-            
-            temp_video = safe_video_filename
-            with open(temp_video, "wb") as f:
-                f.write(uploaded_edit_video.getbuffer())
-            
-            # Tahrirlangan SRT faylini saqlash
-            temp_srt = generate_unique_filename("temp_edited.srt", "temp")
-            with open(temp_srt, "w", encoding="utf-8") as f:
-                f.write(edited_srt)
+            # Matnni tuzatib qayta biriktirishda faqat o'zgargan qismlar qayta kodlanadi
+            burn_mode, burn_profile = select_burn_options("edit_burn", default="incremental")
             
             if st.button("🎬 Videoga subtitl qo'shish", use_container_width=True):
-                with st.spinner("Videoga subtitl qo'shilmoqda..."):
-                    try:
-                        out_path = burn_subtitles(temp_video, temp_srt)
-                        if out_path and os.path.exists(out_path):
-                            output_size = get_file_size_mb(out_path)
-                            
-                            # Chiqish fayli nomi
-                            output_filename = generate_unique_filename("video_with_subtitles.mp4", "output")
-                            
-                            with open(out_path, "rb") as f:
-                                st.download_button(
-                                    f"🎥 Subtitlli videoni yuklab olish ({output_size:.1f} MB)", 
-                                    f, 
-                                    file_name=output_filename, 
-                                    use_container_width=True
-                                )
-                            
-                            st.success("✅ Tayyor!")
-                            
-                            st.markdown(f"""
-                            <div class='file-info'>
-                                <strong>🎬 Video fayli:</strong> {output_filename}<br>
-                                <strong>📊 Hajmi:</strong> {output_size:.1f} MB<br>
-                                <strong>✅ Status:</strong> Subtitl biriktirildi
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                        else:
-                            st.error("Videoga subtitl qo'shishda xatolik.")
-                    except Exception as e:
-                        st.error(f"Xatolik: {str(e)}")
+                # Tahrirlangan SRT faylini saqlash (vazifa tugagach o'chiriladi)
+                temp_srt = os.path.join(session_dir(), generate_unique_filename("temp_edited.srt", "temp"))
+                write_cues_srt(edited_cues, temp_srt)
+                submit_job("edit_burn", "burn", run_burn_job, temp_video, temp_srt, burn_mode, burn_profile, True,
+                           stored_edit_video.sha256)
             
-            # Vaqtinchalik fayllarni tozalash
-            try:
-                if os.path.exists(temp_srt):
-                    os.remove(temp_srt)
-                if os.path.exists(temp_video):
-                    os.remove(temp_video)
-            except:
-                pass
+            job = render_job("edit_burn", "Videoga subtitl qo'shish")
+            if job and job.status == DONE:
+                out_path = job.result
+                if out_path and os.path.exists(out_path):
+                    output_size = get_file_size_mb(out_path)
+                    
+                    # Chiqish fayli nomi
+                    output_ext = os.path.splitext(out_path)[1]
+                    output_filename = generate_unique_filename(f"video_with_subtitles{output_ext}", "output")
+                    
+                    render_file_download(
+                        out_path, f"🎥 Subtitlli videoni yuklab olish ({output_size:.1f} MB)", output_filename)
+                    
+                    st.success("✅ Tayyor!")
+                    
+                    st.markdown(f"""
+                    <div class='file-info'>
+                        <strong>🎬 Video fayli:</strong> {output_filename}<br>
+                        <strong>📊 Hajmi:</strong> {output_size:.1f} MB<br>
+                        <strong>✅ Status:</strong> Subtitl biriktirildi
+                    </div>
+                    """, unsafe_allow_html=True)
+                    
+                else:
+                    st.error("Videoga subtitl qo'shishda xatolik.")
     else:
         st.info("Subtitl faylini yuklang yoki avvalgi bosqichda yarating/yuklang.")
 
@@ -596,7 +918,15 @@ with tab4:
     uploaded_srt2 = st.file_uploader("Subtitl (.srt) faylini yuklang", type=["srt"], key="srt_upload_attach")
     
     if uploaded_video2 and uploaded_srt2:
-        video_size_mb = len(uploaded_video2.getvalue()) / (1024 * 1024)
+        # Fayllarni diskka bo'laklab yozish
+        with st.spinner("Video yuklanmoqda..."):
+            stored_video = save_uploaded_file(uploaded_video2, "attach_video")
+        video_path = stored_video.path
+        srt_path = save_uploaded_file(uploaded_srt2, "attach_srt").path
+        video_size_mb = stored_video.size / (1024 * 1024)
+        media_summary = describe_media(video_path, stored_video.sha256)
+        if media_summary:
+            st.caption(media_summary)
         
         if video_size_mb > 100:
             st.markdown(f"""
@@ -606,21 +936,8 @@ with tab4:
             </div>
             """, unsafe_allow_html=True)
         
-        # Unikal fayl nomlari yaratish
-        video_filename = generate_unique_filename(uploaded_video2.name, "attach_video")
-        srt_filename = generate_unique_filename(uploaded_srt2.name, "attach_srt")
-        
-        safe_video_filename = get_safe_filename(video_filename)
-        safe_srt_filename = get_safe_filename(srt_filename)
-        
-        video_path = safe_video_filename
-        srt_path = safe_srt_filename
-        
-        with open(video_path, "wb") as f:
-            f.write(uploaded_video2.getbuffer())
-        
-        with open(srt_path, "wb") as f:
-            f.write(uploaded_srt2.getbuffer())
+        safe_video_filename = video_path
+        safe_srt_filename = srt_path
         
         st.success(f"✅ Video va subtitl yuklandi! Video hajmi: {video_size_mb:.1f} MB")
         
@@ -633,38 +950,37 @@ with tab4:
         </div>
         """, unsafe_allow_html=True)
         
+        burn_mode, burn_profile = select_burn_options("attach_burn")
+        
         if st.button("🔗 Videoga subtitl biriktirish", use_container_width=True):
-            with st.spinner("Videoga subtitl biriktirilmoqda..."):
-                try:
-                    out_path = burn_subtitles(video_path, srt_path)
-                    if out_path and os.path.exists(out_path):
-                        output_size = get_file_size_mb(out_path)
-                        
-                        # Chiqish fayli nomi
-                        output_filename = generate_unique_filename("video_with_subtitles.mp4", "final")
-                        
-                        with open(out_path, "rb") as f:
-                            st.download_button(
-                                f"🎥 Subtitlli videoni yuklab olish ({output_size:.1f} MB)", 
-                                f, 
-                                file_name=output_filename, 
-                                use_container_width=True
-                            )
-                        
-                        st.success("✅ Tayyor!")
-                        
-                        st.markdown(f"""
-                        <div class='file-info'>
-                            <strong>🎬 Yakuniy video:</strong> {output_filename}<br>
-                            <strong>📊 Hajmi:</strong> {output_size:.1f} MB<br>
-                            <strong>✅ Status:</strong> Subtitl muvaffaqiyatli biriktirildi
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                    else:
-                        st.error("Videoga subtitl biriktirishda xatolik.")
-                except Exception as e:
-                    st.error(f"Xatolik: {str(e)}")
+            submit_job("attach_burn", "burn", run_burn_job, video_path, srt_path, burn_mode, burn_profile, False,
+                       stored_video.sha256)
+        
+        job = render_job("attach_burn", "Videoga subtitl biriktirish")
+        if job and job.status == DONE:
+            out_path = job.result
+            if out_path and os.path.exists(out_path):
+                output_size = get_file_size_mb(out_path)
+                
+                # Chiqish fayli nomi
+                output_ext = os.path.splitext(out_path)[1]
+                output_filename = generate_unique_filename(f"video_with_subtitles{output_ext}", "final")
+                
+                render_file_download(
+                    out_path, f"🎥 Subtitlli videoni yuklab olish ({output_size:.1f} MB)", output_filename)
+                
+                st.success("✅ Tayyor!")
+                
+                st.markdown(f"""
+                <div class='file-info'>
+                    <strong>🎬 Yakuniy video:</strong> {output_filename}<br>
+                    <strong>📊 Hajmi:</strong> {output_size:.1f} MB<br>
+                    <strong>✅ Status:</strong> Subtitl muvaffaqiyatli biriktirildi
+                </div>
+                """, unsafe_allow_html=True)
+                
+            else:
+                st.error("Videoga subtitl biriktirishda xatolik.")
     else:
         st.info("Video va subtitl faylini yuklang.")
 
@@ -696,6 +1012,39 @@ with st.sidebar:
         st.write(f"📝 Joriy subtitl: {os.path.basename(st.session_state.current_srt)}")
         st.write(f"📊 Hajmi: {srt_size:.1f} KB")
     
+    registry = get_registry()
+    loaded_models = registry.loaded_models()
+    if loaded_models:
+        st.write(f"🧠 Xotiradagi modellar: {', '.join(loaded_models)} "
+                 f"(~{registry.used_memory_mb():.0f} / {registry.budget_mb} MB)")
+        # Vazifada ishlatilayotgan modellar chiqarilmaydi
+        if st.button("🧠 Modellarni xotiradan bo'shatish"):
+            registry.clear()
+            st.rerun()
+    
+    translation_memory = get_translation_memory()
+    if translation_memory is not None:
+        tm_stats = translation_memory.stats()
+        st.write(f"📚 Tarjima xotirasi: {tm_stats['entries']} ta yozuv, "
+                 f"topilish darajasi {tm_stats['hit_rate'] * 100:.0f}%")
+    
+    stage_summary = metrics.summary()
+    if stage_summary:
+        with st.expander("⏱️ Bosqichlar statistikasi"):
+            st.table([
+                {
+                    "Bosqich": name,
+                    "Soni": item["count"],
+                    "O'rtacha, s": f"{item['mean_s']:.2f}",
+                    "p95, s": f"{item['p95_s']:.2f}",
+                    "CPU, s": f"{item['cpu_mean_s']:.2f}",
+                    "RSS, MB": f"{item['rss_mb']:.0f}" if item["rss_mb"] is not None else "-",
+                    "RSS o'sishi, MB": (f"{item['rss_delta_max_mb']:+.0f}"
+                                        if item["rss_delta_max_mb"] is not None else "-"),
+                }
+                for name, item in stage_summary.items()
+            ])
+    
     if st.button("🗑️ Barcha fayllarni tozalash"):
         cleanup_temp_files()
         st.session_state.video_files = {}
@@ -704,6 +1053,9 @@ with st.sidebar:
         st.session_state.current_srt = None
         st.success("Barcha fayllar tozalandi!")
 
-# Dastur tugaganda vaqtinchalik fayllarni tozalash
-import atexit
-atexit.register(cleanup_temp_files)
+# Fonda ishlayotgan vazifa bo'lsa, holatini yangilash uchun sahifani qayta yuklash.
+# Vazifalar skriptdan mustaqil ishlaydi, shuning uchun rerunlar ularni to'xtatmaydi
+_finish_run()
+if jobs_running:
+    time.sleep(1)
+    st.rerun()
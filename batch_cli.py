@@ -0,0 +1,263 @@
+"""Ko'p videolarni brauzersiz (Streamlit siz) qayta ishlash.
+
+Misol:
+    python batch_cli.py videos/ "archive/**/*.mkv" -o out/ --model small \
+        --languages uz,ru --burn soft --workers 2 --summary summary.json
+
+Har bir video uchun chiqish fayllari:
+    <nom>.srt, <nom>.<til>.srt va (--burn bo'lsa) <nom>.subtitled.mp4/.mkv
+--burn multitrack - barcha tarjimalar til teglari bilan alohida yumshoq treklar
+bo'ladi (tarjima tillari bo'lmasa, asl SRT bitta trek sifatida qo'shiladi).
+Chiqish fayli kirish faylidan yangiroq bo'lsa, u qayta yaratilmaydi (--force).
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import cues
+import settings
+from instrumentation import tracing
+from subtitler import (
+    BURN_PROFILES, burn_subtitle_tracks, burn_subtitles, generate_subtitles, transcribe_long_media,
+    translate_subtitles_multi,
+)
+
+logger = logging.getLogger("batch_cli")
+
+MEDIA_EXTENSIONS = (".mp4", ".mkv", ".mov", ".avi", ".webm", ".m4v", ".mp3", ".wav", ".m4a", ".flac")
+
+BURN_MODES = ("none", "soft", "hard", "segmented", "multitrack")
+
+
+def collect_inputs(patterns, recursive=False):
+    """Kataloglar, glob andozalari va fayllardan (yo'l, chiqish nomi) ro'yxatini tuzish"""
+    found = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for dirpath, dirnames, filenames in os.walk(pattern):
+                if not recursive:
+                    dirnames.clear()
+                for name in sorted(filenames):
+                    if name.lower().endswith(MEDIA_EXTENSIONS):
+                        path = os.path.join(dirpath, name)
+                        # Katalog tuzilmasi chiqishda saqlanadi
+                        found.append((path, os.path.splitext(os.path.relpath(path, pattern))[0]))
+        elif glob.has_magic(pattern):
+            for path in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(path):
+                    found.append((path, os.path.splitext(os.path.basename(path))[0]))
+        elif os.path.isfile(pattern):
+            found.append((pattern, os.path.splitext(os.path.basename(pattern))[0]))
+        else:
+            logger.warning("Topilmadi: %s", pattern)
+
+    # Bir fayl ikki marta berilgan bo'lsa, bir marta ishlanadi; nomlar to'qnashuvi raqam bilan ajratiladi
+    inputs = []
+    seen_paths = set()
+    used_names = set()
+    for path, name in found:
+        real = os.path.realpath(path)
+        if real in seen_paths:
+            continue
+        seen_paths.add(real)
+        unique_name = name
+        counter = 1
+        while unique_name in used_names:
+            counter += 1
+            unique_name = f"{name}_{counter}"
+        used_names.add(unique_name)
+        inputs.append((path, unique_name))
+    return inputs
+
+
+def is_up_to_date(output_path, *sources):
+    """Chiqish fayli mavjud va barcha manbalardan yangiroqmi"""
+    try:
+        output_mtime = os.path.getmtime(output_path)
+    except OSError:
+        return False
+    return all(output_mtime >= os.path.getmtime(source) for source in sources)
+
+
+def _publish(tmp_path, dest_path):
+    # Vaqtinchalik natijani chiqish katalogiga ko'chirish (boshqa diskda ham ishlaydi)
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    shutil.move(tmp_path, dest_path)
+    return dest_path
+
+
+def _existing_burn_output(base):
+    for ext in (".mp4", ".mkv"):
+        if os.path.exists(base + ext):
+            return base + ext
+    return None
+
+
+def process_file(video_path, name, args):
+    """Bitta videoni to'liq ishlash; natija lug'atini qaytaradi"""
+    started = time.perf_counter()
+    base = os.path.join(args.output_dir, name)
+    outputs = {"srt": base + ".srt", "translations": {}, "video": None}
+    result = {"input": video_path, "status": "skipped", "outputs": outputs, "error": None}
+    did_work = False
+
+    with tracing(f"batch {name}") as tracer:
+        try:
+            srt_path = outputs["srt"]
+            if args.force or not is_up_to_date(srt_path, video_path):
+                logger.info("%s: transkripsiya (%s)", name, args.model)
+                if args.mode == "window":
+                    segments = transcribe_long_media(video_path, args.model, quantize=args.quantize,
+                                                     threads=args.torch_threads, vad=args.vad)
+                    tmp_srt = srt_path + ".part"
+                    # -r bilan ichki katalog hali yaratilmagan bo'lishi mumkin
+                    os.makedirs(os.path.dirname(srt_path) or ".", exist_ok=True)
+                    cues.write_srt(segments, tmp_srt)
+                    os.replace(tmp_srt, srt_path)
+                else:
+                    _publish(generate_subtitles(video_path, args.model, quantize=args.quantize,
+                                                threads=args.torch_threads, vad=args.vad,
+                                                batch_size=args.batch_size), srt_path)
+                did_work = True
+
+            stale = [lang for lang in args.languages
+                     if args.force or not is_up_to_date(f"{base}.{lang}.srt", srt_path)]
+            if stale:
+                logger.info("%s: tarjima (%s)", name, ",".join(stale))
+                # SRT bir marta o'qiladi, tillar parallel tarjima qilinadi. Holat fayllari
+                # tufayli manba SRT tahrir qilinganda faqat o'zgargan subtitllar yuboriladi
+                state_paths = {lang: f"{base}.{lang}.state.json" for lang in stale}
+                translated = translate_subtitles_multi(srt_path, stale, state_paths=state_paths)
+                for lang, path in translated.items():
+                    _publish(path, f"{base}.{lang}.srt")
+                did_work = True
+                failed = [lang for lang in stale if lang not in translated]
+                if failed:
+                    raise Exception(f"Tarjima qilib bo'lmadi: {', '.join(failed)}")
+            for lang in args.languages:
+                outputs["translations"][lang] = f"{base}.{lang}.srt"
+
+            if args.burn != "none":
+                # Biriktiriladigan subtitl: --burn-language berilsa tarjima, aks holda asl SRT
+                burn_srt = outputs["translations"].get(args.burn_language, srt_path)
+                if args.burn == "multitrack":
+                    # --burn-language berilsa, shu til birinchi (standart) trek bo'ladi
+                    langs = sorted(outputs["translations"], key=lambda lang: lang != args.burn_language)
+                    tracks = [(outputs["translations"][lang], lang, lang) for lang in langs] or [(srt_path, None, None)]
+                    sources = [path for path, _, _ in tracks]
+                else:
+                    sources = [burn_srt]
+                burn_base = f"{base}.subtitled"
+                existing = _existing_burn_output(burn_base)
+                if args.force or existing is None or not is_up_to_date(existing, video_path, *sources):
+                    logger.info("%s: subtitl biriktirish (%s)", name, args.burn)
+                    if args.burn == "multitrack":
+                        out_path = burn_subtitle_tracks(video_path, tracks)
+                    else:
+                        out_path = burn_subtitles(video_path, burn_srt, args.burn, args.profile)
+                    if out_path is None:
+                        raise Exception("Subtitlni videoga biriktirib bo'lmadi")
+                    existing = _publish(out_path, burn_base + os.path.splitext(out_path)[1])
+                    did_work = True
+                outputs["video"] = existing
+
+            result["status"] = "done" if did_work else "skipped"
+        except Exception as e:
+            logger.error("%s: xatolik: %s", name, e)
+            result["status"] = "failed"
+            result["error"] = str(e)
+
+    stages = {}
+    for event in tracer.events:
+        stages[event["name"]] = round(stages.get(event["name"], 0.0) + event["dur"] / 1e6, 3)
+    result["stages"] = stages
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def run_batch(inputs, args):
+    results = []
+    with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="batch") as pool:
+        futures = {pool.submit(process_file, path, name, args): path for path, name in inputs}
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            logger.info("[%d/%d] %s: %s (%.1f s)", done, len(inputs), result["input"], result["status"], result["seconds"])
+    results.sort(key=lambda r: r["input"])
+    return results
+
+
+def _csv(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Videolar uchun subtitllarni paketli yaratish")
+    parser.add_argument("inputs", nargs="+", help="Kataloglar, glob andozalari yoki fayllar")
+    parser.add_argument("-o", "--output-dir", default="subtitles_out")
+    parser.add_argument("-r", "--recursive", action="store_true", help="Kataloglarni ichma-ich ko'rib chiqish")
+    parser.add_argument("--model", default="base", help="Whisper modeli (tiny, base, small, medium, large)")
+    parser.add_argument("--mode", choices=("plain", "window"), default="plain",
+                        help="window - uzun media uchun 30 soniyalik oynalar")
+    parser.add_argument("--quantize", choices=("none", "int8"), default=None,
+                        help="CPU uchun int8 kvantlash (standart: SUBTITLER_QUANTIZE)")
+    parser.add_argument("--no-vad", dest="vad", action="store_false", default=None,
+                        help="Sukunatni o'tkazib yubormasdan butun audioni transkripsiya qilish")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Bir vaqtda dekodlanadigan 30 soniyalik oynalar soni (standart: SUBTITLER_DECODE_BATCH_SIZE)")
+    parser.add_argument("--torch-threads", type=int, default=None, help="torch intra-op oqimlari soni")
+    parser.add_argument("--languages", type=_csv, default=[], help="Tarjima tillari, masalan: uz,ru")
+    parser.add_argument("--burn", choices=BURN_MODES, default="none")
+    parser.add_argument("--burn-language", help="Videoga biriktiriladigan tarjima tili")
+    parser.add_argument("--profile", choices=BURN_PROFILES, default="balanced", help="Qattiq biriktirish profili")
+    parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS,
+                        help="Bir vaqtda ishlanadigan fayllar soni")
+    parser.add_argument("--force", action="store_true", help="Yangi natijalarni ham qayta yaratish")
+    parser.add_argument("--summary", help="JSON xulosa fayli (standart: <output-dir>/summary.json)")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else settings.LOG_LEVEL,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    if args.burn_language and args.burn_language not in args.languages:
+        parser.error("--burn-language --languages ro'yxatida bo'lishi kerak")
+    args.workers = max(1, args.workers)
+
+    inputs = collect_inputs(args.inputs, args.recursive)
+    if not inputs:
+        logger.error("Ishlanadigan fayl topilmadi")
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    started = time.time()
+    results = run_batch(inputs, args)
+    summary = {
+        "started": started,
+        "seconds": round(time.time() - started, 3),
+        "model": args.model,
+        "languages": args.languages,
+        "burn": args.burn,
+        "totals": {
+            status: sum(1 for r in results if r["status"] == status)
+            for status in ("done", "skipped", "failed")
+        },
+        "files": results,
+    }
+    summary_path = args.summary or os.path.join(args.output_dir, "summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    logger.info("Xulosa: %s %s", summary_path, summary["totals"])
+    return 1 if summary["totals"]["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
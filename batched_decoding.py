@@ -0,0 +1,184 @@
+import logging
+
+import numpy as np
+
+import settings
+from instrumentation import stage
+from jobs import check_cancelled
+from vad import frame_energy_db
+
+logger = logging.getLogger(__name__)
+
+# Whisper oynasi: 30 soniya, 16 kHz
+SAMPLE_RATE = 16000
+WINDOW_SAMPLES = 30 * SAMPLE_RATE
+# Oyna chegarasi so'z o'rtasiga tushmasligi uchun oxirgi soniyalardagi eng jim joydan kesiladi
+CUT_SEARCH_SAMPLES = 5 * SAMPLE_RATE
+# Vaqt belgisi tokenlari aniqligi (soniya)
+TIME_PRECISION = 0.02
+
+# whisper.transcribe dagi sifat chegaralari
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+COMPRESSION_RATIO_THRESHOLD = 2.4
+FALLBACK_TEMPERATURES = (0.2, 0.4, 0.6, 0.8, 1.0)
+
+
+def resolve_batch_size(batch_size=None):
+    """Bir vaqtda dekodlanadigan oynalar soni; None berilsa sozlamadan olinadi"""
+    if batch_size is None:
+        batch_size = settings.DECODE_BATCH_SIZE
+    return max(1, int(batch_size))
+
+
+def plan_windows(audio, sample_rate=SAMPLE_RATE):
+    """Audioni 30 soniyadan oshmaydigan oynalarga bo'lish; [(boshlanish, tugash)] namunalarda"""
+    frame_len = sample_rate * 30 // 1000
+    windows = []
+    start = 0
+    while start < len(audio):
+        end = start + WINDOW_SAMPLES
+        if end < len(audio):
+            search_start = end - CUT_SEARCH_SAMPLES
+            energy = frame_energy_db(audio[search_start:end], frame_len)
+            end = search_start + int(np.argmin(energy)) * frame_len + frame_len // 2
+        else:
+            end = len(audio)
+        windows.append((start, end))
+        start = end
+    return windows
+
+
+def log_mel_batch(chunks, n_mels, device):
+    """Bir nechta oyna uchun log-mel spektrogrammani bitta tenzor amalida hisoblash.
+
+    whisper.log_mel_spectrogram bilan bir xil, faqat normallashtirish har bir
+    oyna uchun alohida bajariladi.
+    """
+    import torch
+    from whisper.audio import HOP_LENGTH, N_FFT, mel_filters
+
+    batch = np.zeros((len(chunks), WINDOW_SAMPLES), dtype=np.float32)
+    for i, chunk in enumerate(chunks):
+        batch[i, :len(chunk)] = chunk
+    audio = torch.from_numpy(batch).to(device)
+
+    window = torch.hann_window(N_FFT).to(device)
+    stft = torch.stft(audio, N_FFT, HOP_LENGTH, window=window, return_complex=True)
+    magnitudes = stft[..., :-1].abs() ** 2
+    mel_spec = mel_filters(device, n_mels) @ magnitudes
+    log_spec = torch.clamp(mel_spec, min=1e-10).log10()
+    log_spec = torch.maximum(log_spec, log_spec.amax(dim=(1, 2), keepdim=True) - 8.0)
+    return (log_spec + 4.0) / 4.0
+
+
+def detect_language(model, mel):
+    """Birinchi oynalar bo'yicha eng ehtimoliy til"""
+    if not model.is_multilingual:
+        return "en"
+    _, probs = model.detect_language(mel)
+    totals = {}
+    for window_probs in probs:
+        for lang, p in window_probs.items():
+            totals[lang] = totals.get(lang, 0.0) + p
+    return max(totals, key=totals.get)
+
+
+def split_segments(tokens, tokenizer, offset, length):
+    """Oyna tokenlarini vaqt belgilari bo'yicha segmentlarga ajratish (vaqtlar asl audioda)"""
+    segments = []
+    start = None
+    last_time = 0.0
+    text_tokens = []
+
+    def flush(end):
+        text = tokenizer.decode(text_tokens).strip()
+        # Ochuvchi vaqt belgisi bo'lmasa, matn oxirgi belgidan boshlanadi
+        seg_start = min(last_time if start is None else start, length)
+        if text:
+            segments.append({
+                "start": offset + seg_start,
+                "end": offset + min(max(end, seg_start), length),
+                "text": text,
+            })
+
+    for token in tokens:
+        if token >= tokenizer.timestamp_begin:
+            time = (token - tokenizer.timestamp_begin) * TIME_PRECISION
+            if start is not None and text_tokens:
+                flush(time)
+                text_tokens = []
+                start = None
+            else:
+                start = time
+            last_time = time
+        elif token < tokenizer.eot:
+            text_tokens.append(token)
+
+    # Yopuvchi vaqt belgisisiz qolgan matn oyna oxirigacha davom etadi
+    if text_tokens:
+        flush(length)
+    return segments
+
+
+def _needs_fallback(result):
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+        return False
+    return result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD
+
+
+def _decode(model, mel, language, temperature):
+    import whisper
+    options = whisper.DecodingOptions(
+        task="transcribe", language=language, temperature=temperature,
+        without_timestamps=False, fp16=False
+    )
+    return whisper.decode(model, mel, options)
+
+
+def decode_batch(model, mel, language):
+    """Oynalar to'plamini dekodlash; sifatsiz chiqqan oynalar yuqoriroq haroratda qayta dekodlanadi"""
+    results = _decode(model, mel, language, 0.0)
+    for temperature in FALLBACK_TEMPERATURES:
+        retry = [i for i, result in enumerate(results) if _needs_fallback(result)]
+        if not retry:
+            break
+        for i, result in zip(retry, _decode(model, mel[retry], language, temperature)):
+            results[i] = result
+    return results
+
+
+def transcribe_batched(model, audio, batch_size=8, language=None):
+    """Whisper oynalarini to'plamlab transkripsiya qilish.
+
+    Oynalar ketma-ket emas, `batch_size` tadan birga kodlanadi va dekodlanadi,
+    segmentlar esa oynalar tartibida yig'iladi. model.transcribe bilan bir xil
+    ko'rinishdagi {"start", "end", "text"} lug'atlari ro'yxatini qaytaradi.
+    """
+    from whisper.tokenizer import get_tokenizer
+
+    windows = plan_windows(audio)
+    segments = []
+    tokenizer = None
+    for batch_start in range(0, len(windows), batch_size):
+        check_cancelled()
+        batch = windows[batch_start:batch_start + batch_size]
+        with stage("decode_batch", windows=len(batch)):
+            mel = log_mel_batch([audio[start:end] for start, end in batch], model.dims.n_mels, model.device)
+            if tokenizer is None:
+                language = language or detect_language(model, mel)
+                tokenizer = get_tokenizer(
+                    model.is_multilingual, num_languages=model.num_languages,
+                    language=language, task="transcribe"
+                )
+            results = decode_batch(model, mel, language)
+
+        for (start, end), result in zip(batch, results):
+            # Nutqsiz oyna (whisper.transcribe dagi kabi) tashlab yuboriladi
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                continue
+            segments.extend(split_segments(
+                result.tokens, tokenizer, start / SAMPLE_RATE, (end - start) / SAMPLE_RATE
+            ))
+    logger.debug("%d oyna %d tadan dekodlandi, til: %s", len(windows), batch_size, language)
+    return segments
@@ -0,0 +1,391 @@
+"""Sintetik media bilan butun jarayonni o'lchash.
+
+Misol:
+    python benchmark.py --durations 30,120 --resolutions 640x360,1280x720 \
+        --models tiny,base --output bench.json --baseline baseline.json
+
+Kirish fayllari ffmpeg lavfi orqali oflayn yaratiladi (test kadrlar +
+sinus va shovqin aralashmasi). Tarjima mahalliy stub HTTP serverga
+yuboriladi, shuning uchun natijalar tarmoqqa bog'liq emas. Kesh va tarjima
+xotirasi o'chiriladi, aks holda takroriy o'lchovlar keshdan olinadi.
+
+--speech-media va --speech-reference berilsa, har bir model va kvantlash
+turi uchun nutqli faylda so'z xatolik darajasi (WER) ham o'lchanadi -
+tezlik va aniqlikni birga solishtirish uchun.
+
+--batch-sizes bilan transkripsiya oynalarni to'plamlab dekodlash bilan
+ham o'lchanadi; media_s_per_core_s - bitta yadroga to'g'ri keladigan
+o'tkazuvchanlik (media soniyasi / devor soniyasi / torch oqimlari).
+
+rss_mb - bosqich boshi va oxiridagi joriy RSS ning kattasi, rss_delta_mb -
+bosqich davomida xotira o'sishi (bosqich ichidagi qisqa cho'qqilar
+ko'rinmaydi). cpu_s - jarayonning barcha oqimlari (torch ichki oqimlari
+ham) va bola jarayonlar (ffmpeg) CPU vaqti.
+"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import settings
+
+# O'lchov natijalari keshdan olinmasligi uchun
+settings.RESULT_CACHE_ENABLED = False
+settings.TRANSLATION_MEMORY_ENABLED = False
+
+import cues
+from instrumentation import stage, tracing
+from subtitler import (
+    burn_subtitles, generate_subtitles, get_ffmpeg_path, load_audio, translate_subtitles,
+)
+from translator import HttpBackend, TranslationEngine
+
+STAGES = ("startup", "extract", "generate", "accuracy", "translate", "burn")
+
+# Ilova ishga tushganda import qilinadigan modullar (Streamlit siz)
+STARTUP_MODULES = ("subtitler", "translator", "model_registry", "jobs", "uploads")
+
+
+# ================== SINTETIK MEDIA ==================
+
+def make_media(path, duration, resolution):
+    """Test kadrlar va sinus+shovqin audiodan iborat video yaratish"""
+    width, height = resolution.split("x")
+    cmd = [
+        get_ffmpeg_path(), "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate=25:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={duration}",
+        "-f", "lavfi", "-i", f"anoisesrc=color=pink:amplitude=0.05:sample_rate=44100:duration={duration}",
+        "-filter_complex", "[1:a][2:a]amix=inputs=2[a]",
+        "-map", "0:v", "-map", "[a]",
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", "50",
+        "-c:a", "aac", "-shortest", path,
+    ]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def make_srt(path, duration, cue_seconds=2.5):
+    """Media uzunligi bo'yicha bir tekis taqsimlangan sintetik subtitllar"""
+    step = round(cue_seconds * 1000)
+    generated = (
+        cues.Cue(start, min(start + step - 100, duration * 1000), f"Test subtitle number {i}, line {i % 7}")
+        for i, start in enumerate(range(0, int(duration * 1000), step))
+    )
+    cues.write_srt(generated, path)
+    return path
+
+
+# ================== STUB TARJIMA SERVERI ==================
+
+class _StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length).decode("utf-8"))
+        if self.latency:
+            time.sleep(self.latency)
+        # Matn o'zgarmaydi, ajratkichlar ham saqlanadi
+        body = json.dumps({"translatedText": payload["q"]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubTranslationServer:
+    """LibreTranslate bilan mos, matnni qaytaradigan mahalliy server"""
+
+    def __init__(self, latency=0.0):
+        handler = type("Handler", (_StubHandler,), {"latency": latency})
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/translate"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+
+# ================== O'LCHASH ==================
+
+def measure(name, func, repeat, **case):
+    """`func` ni `repeat` marta bajarib, mediana vaqt va eng yuqori RSS ni qaytarish.
+    
+    `func` lug'at qaytarsa (masalan, WER), oxirgi ishga tushirishdagi qiymatlar natijaga qo'shiladi.
+    """
+    runs = []
+    extra = None
+    for _ in range(repeat):
+        with tracing(f"benchmark {name}") as tracer:
+            with stage(name, **case):
+                extra = func()
+        event = tracer.events[-1]["args"]
+        runs.append(event)
+
+    result = {
+        "stage": name,
+        "case": case,
+        "repeat": repeat,
+        "wall_s": statistics.median(r["wall_s"] for r in runs),
+        "wall_min_s": min(r["wall_s"] for r in runs),
+        # O'lchovlar ketma-ket bajariladi, shuning uchun jarayon CPU vaqti faqat shu bosqichniki
+        "cpu_s": statistics.median(r["process_cpu_s"] + r["child_cpu_s"] for r in runs),
+        "rss_mb": max((r["rss_mb"] or 0) for r in runs) or None,
+        "rss_delta_mb": max((r["rss_delta_mb"] or 0) for r in runs),
+    }
+    if case.get("duration"):
+        # Bir soniya devor vaqtida qayta ishlangan media soniyalari
+        result["media_s_per_s"] = round(case["duration"] / result["wall_s"], 3) if result["wall_s"] else None
+    if isinstance(extra, dict):
+        result.update(extra)
+    print(f"{name:10} {json.dumps(case, sort_keys=True):60} {result['wall_s']:8.3f} s")
+    return result
+
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def word_error_rate(reference, hypothesis):
+    """So'z darajasidagi Levenshtein masofasi / etalon so'zlar soni"""
+    ref, hyp = _words(reference), _words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def read_reference(path):
+    """Etalon matn: oddiy matn fayli yoki SRT"""
+    if path.lower().endswith(".srt"):
+        return " ".join(cue.text for cue in cues.iter_srt(path))
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return f.read()
+
+
+def transcribe_and_score(media, reference, model_size, quantize, threads, batch_size):
+    srt_path = generate_subtitles(media, model_size, quantize=quantize, threads=threads, batch_size=batch_size)
+    try:
+        hypothesis = " ".join(cue.text for cue in cues.iter_srt(srt_path))
+    finally:
+        os.remove(srt_path)
+    return {"wer": round(word_error_rate(reference, hypothesis), 4)}
+
+
+def import_in_fresh_process(modules):
+    """Modullarni yangi Python jarayonida import qilish (sovuq ishga tushish)"""
+    code = "import " + ", ".join(modules)
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+def torch_threads(args):
+    """Transkripsiyada ishlatilgan torch oqimlari soni"""
+    if args.torch_threads:
+        return args.torch_threads
+    import torch
+    return torch.get_num_threads()
+
+
+def run_benchmarks(args, work_dir):
+    results = []
+    if "startup" in args.stages:
+        results.append(measure(
+            "startup", lambda: import_in_fresh_process(STARTUP_MODULES), args.repeat,
+            modules=",".join(STARTUP_MODULES)
+        ))
+    media_stages = {"extract", "generate", "burn"} & set(args.stages)
+    for duration in args.durations:
+        srt_path = make_srt(os.path.join(work_dir, f"media_{duration}s.srt"), duration)
+
+        for resolution in args.resolutions if media_stages else ():
+            media = make_media(os.path.join(work_dir, f"media_{duration}s_{resolution}.mp4"), duration, resolution)
+            case = {"duration": duration, "resolution": resolution}
+
+            if "extract" in args.stages:
+                # Transkripsiya ishlatadigan yo'l: ffmpeg quvuridan to'g'ridan-to'g'ri NumPy massiviga
+                results.append(measure("extract", lambda: load_audio(media), args.repeat, **case))
+
+            if "generate" in args.stages:
+                for model_size in args.models:
+                    for quantize in args.quantize:
+                        for batch_size in args.batch_sizes:
+                            result = measure(
+                                "generate",
+                                lambda: os.remove(generate_subtitles(media, model_size, quantize=quantize,
+                                                                     threads=args.torch_threads,
+                                                                     batch_size=batch_size)),
+                                args.repeat, model=model_size, quantize=quantize, batch_size=batch_size, **case
+                            )
+                            if result.get("media_s_per_s"):
+                                result["media_s_per_core_s"] = round(result["media_s_per_s"] / torch_threads(args), 3)
+                            results.append(result)
+
+            if "burn" in args.stages:
+                for mode in args.burn_modes:
+                    def burn():
+                        out_path = burn_subtitles(media, srt_path, mode=mode, profile=args.profile)
+                        if out_path is None:
+                            raise Exception(f"Subtitl biriktirib bo'lmadi ({mode})")
+                        os.remove(out_path)
+                    results.append(measure("burn", burn, args.repeat, mode=mode, profile=args.profile, **case))
+
+        # Tarjima faqat subtitllar soniga bog'liq - o'lcham bo'yicha takrorlanmaydi
+        if "translate" in args.stages:
+            with StubTranslationServer(args.translate_latency) as server:
+                engine = TranslationEngine(HttpBackend(server.url), rate_per_sec=0, max_retries=0)
+                results.append(measure(
+                    "translate", lambda: os.remove(translate_subtitles(srt_path, "uz", engine=engine)),
+                    args.repeat, duration=duration
+                ))
+
+    if "accuracy" in args.stages and args.speech_media:
+        reference = read_reference(args.speech_reference)
+        for model_size in args.models:
+            for quantize in args.quantize:
+                for batch_size in args.batch_sizes:
+                    results.append(measure(
+                        "accuracy",
+                        lambda: transcribe_and_score(args.speech_media, reference, model_size, quantize,
+                                                     args.torch_threads, batch_size),
+                        args.repeat, media=os.path.basename(args.speech_media), model=model_size,
+                        quantize=quantize, batch_size=batch_size
+                    ))
+    return results
+
+
+def environment_info():
+    try:
+        version = subprocess.run([get_ffmpeg_path(), "-version"], capture_output=True, text=True).stdout.splitlines()[0]
+    except Exception:
+        version = None
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "ffmpeg": version,
+    }
+
+
+# ================== BAZAVIY NATIJA BILAN SOLISHTIRISH ==================
+
+def _case_key(result):
+    return result["stage"], json.dumps(result["case"], sort_keys=True)
+
+
+def compare(results, baseline, threshold):
+    """Bazaviy natijadan `threshold` ulushdan ko'proq sekinlashgan yoki ko'p xotira olgan o'lchovlar"""
+    previous = {_case_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get(_case_key(result))
+        if old is None:
+            continue
+        for metric in ("wall_s", "rss_mb", "wer"):
+            new_value, old_value = result.get(metric), old.get(metric)
+            if not new_value or not old_value:
+                continue
+            change = new_value / old_value - 1
+            if change > threshold:
+                regressions.append({
+                    "stage": result["stage"],
+                    "case": result["case"],
+                    "metric": metric,
+                    "baseline": old_value,
+                    "current": new_value,
+                    "change": round(change, 3),
+                })
+    return regressions
+
+
+def _csv(value, cast=str):
+    return [cast(v) for v in value.split(",") if v]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Subtitl jarayoni uchun benchmark")
+    parser.add_argument("--durations", type=lambda v: _csv(v, int), default=[30, 120],
+                        help="Media uzunliklari, soniya (vergul bilan)")
+    parser.add_argument("--resolutions", type=_csv, default=["640x360", "1280x720"])
+    parser.add_argument("--models", type=_csv, default=["tiny", "base"])
+    parser.add_argument("--quantize", type=_csv, default=["none", "int8"],
+                        help="Solishtiriladigan kvantlash turlari (none, int8)")
+    parser.add_argument("--torch-threads", type=int, default=None, help="torch intra-op oqimlari soni")
+    parser.add_argument("--batch-sizes", type=lambda v: _csv(v, int), default=[1, 8],
+                        help="Solishtiriladigan dekodlash to'plami o'lchamlari (1 - model.transcribe)")
+    parser.add_argument("--speech-media", help="Aniqlikni o'lchash uchun nutqli media fayl")
+    parser.add_argument("--speech-reference", help="Nutqli fayl uchun etalon matn (.txt yoki .srt)")
+    parser.add_argument("--stages", type=_csv, default=list(STAGES))
+    parser.add_argument("--burn-modes", type=_csv, default=["soft", "hard"])
+    parser.add_argument("--profile", default="fast")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--translate-latency", type=float, default=0.05,
+                        help="Stub server javobidagi sun'iy kechikish, soniya")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Solishtirish uchun avvalgi natijalar fayli")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Regressiya deb hisoblanadigan o'sish ulushi")
+    parser.add_argument("--keep-media", action="store_true", help="Yaratilgan fayllarni o'chirmaslik")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Noma'lum bosqichlar: {', '.join(sorted(unknown))}")
+    if bool(args.speech_media) != bool(args.speech_reference):
+        parser.error("--speech-media va --speech-reference birga berilishi kerak")
+
+    work_dir = tempfile.mkdtemp(prefix="subtitler_bench_")
+    try:
+        results = run_benchmarks(args, work_dir)
+    finally:
+        if args.keep_media:
+            print(f"Fayllar: {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {"created": time.time(), "environment": environment_info(), "results": results}
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["regressions"] = compare(results, json.load(f), args.threshold)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Natijalar: {args.output}")
+
+    for item in report.get("regressions", []):
+        print(f"REGRESSIYA {item['stage']} {json.dumps(item['case'], sort_keys=True)} "
+              f"{item['metric']}: {item['baseline']} -> {item['current']} (+{item['change'] * 100:.0f}%)")
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
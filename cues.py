@@ -0,0 +1,142 @@
+import io
+
+# Subtitllar uchun yagona model: vaqtlar butun millisekundlarda saqlanadi.
+# O'qish va yozish oqimli - bir vaqtda faqat bitta subtitl xotirada bo'ladi
+
+
+class Cue:
+    """Bitta subtitl: boshlanish va tugash vaqti (ms) hamda matn"""
+
+    __slots__ = ("start", "end", "text")
+
+    def __init__(self, start, end, text):
+        self.start = int(start)
+        self.end = int(end)
+        self.text = text
+
+    @classmethod
+    def from_seconds(cls, start, end, text):
+        return cls(round(start * 1000), round(end * 1000), text)
+
+    def __eq__(self, other):
+        if not isinstance(other, Cue):
+            return NotImplemented
+        return (self.start, self.end, self.text) == (other.start, other.end, other.text)
+
+    def __hash__(self):
+        return hash((self.start, self.end, self.text))
+
+    def __repr__(self):
+        return f"Cue({format_timestamp(self.start)} --> {format_timestamp(self.end)}, {self.text!r})"
+
+
+def format_timestamp(ms):
+    """Millisekundlarni "00:01:02,345" ko'rinishiga o'tkazish"""
+    ms = max(0, int(ms))
+    h, ms = divmod(ms, 3600000)
+    m, ms = divmod(ms, 60000)
+    s, ms = divmod(ms, 1000)
+    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+
+
+def parse_timestamp(value):
+    """"00:01:02,345" (yoki "00:01:02.345") ni millisekundlarga o'tkazish"""
+    hms, _, frac = value.strip().replace(".", ",").partition(",")
+    parts = hms.split(":")
+    if len(parts) == 2:
+        parts.insert(0, "0")
+    h, m, s = (int(p) for p in parts)
+    ms = int((frac + "000")[:3]) if frac else 0
+    return ((h * 60 + m) * 60 + s) * 1000 + ms
+
+
+def iter_cues(lines):
+    """SRT qatorlaridan subtitllarni birma-bir hosil qilish.
+
+    BOM, CRLF, ko'p qatorli matn, yetishmayotgan raqamlar va ortiqcha bo'sh
+    qatorlarga chidamli. Vaqti noto'g'ri bloklar tashlab ketiladi.
+    """
+    start = end = None
+    text_lines = []
+    first = True
+    for line in lines:
+        if first:
+            line = line.lstrip("\ufeff")
+            first = False
+        line = line.rstrip("\r\n")
+
+        if not line.strip():
+            if start is not None:
+                yield Cue(start, end, "\n".join(text_lines))
+            start = end = None
+            text_lines = []
+            continue
+
+        if start is None:
+            if "-->" in line:
+                left, _, right = line.partition("-->")
+                try:
+                    start = parse_timestamp(left)
+                    # Vaqtdan keyingi joylashuv belgilari (X1:...) e'tiborga olinmaydi
+                    end = parse_timestamp(right.split()[0])
+                except (ValueError, IndexError):
+                    start = end = None
+            # Aks holda bu subtitl raqami yoki keraksiz qator
+            continue
+
+        text_lines.append(line.strip())
+
+    if start is not None:
+        yield Cue(start, end, "\n".join(text_lines))
+
+
+def iter_srt(path):
+    """SRT faylni oqimli o'qish"""
+    with open(path, "r", encoding="utf-8-sig", errors="replace", newline=None) as f:
+        yield from iter_cues(f)
+
+
+def read_srt(path):
+    return list(iter_srt(path))
+
+
+def parse_srt_text(text):
+    return list(iter_cues(io.StringIO(text)))
+
+
+def write_cues(cues, f, on_cue=None):
+    """Subtitllarni ochiq faylga yozish (raqamlar 1 dan boshlanadi)"""
+    count = 0
+    for count, cue in enumerate(cues, 1):
+        f.write(f"{count}\n{format_timestamp(cue.start)} --> {format_timestamp(cue.end)}\n{cue.text.strip()}\n\n")
+        if on_cue:
+            on_cue(count)
+    return count
+
+
+def write_srt(cues, path, on_cue=None):
+    """Subtitllarni SRT faylga oqimli yozish; yozilgan subtitllar sonini qaytaradi"""
+    with open(path, "w", encoding="utf-8") as f:
+        return write_cues(cues, f, on_cue)
+
+
+def to_srt_text(cues):
+    buffer = io.StringIO()
+    write_cues(cues, buffer)
+    return buffer.getvalue()
+
+
+def from_segments(segments):
+    """Whisper segmentlarini (soniyalarda) subtitllarga aylantirish"""
+    for seg in segments:
+        text = seg["text"].strip()
+        if text:
+            yield Cue.from_seconds(seg["start"], seg["end"], text)
+
+
+def clip_cues(cues, start, end):
+    """[start, end) oralig'iga (ms) tushgan subtitllarni oraliq boshiga nisbatan siljitish"""
+    for cue in cues:
+        if cue.end <= start or cue.start >= end:
+            continue
+        yield Cue(max(cue.start, start) - start, min(cue.end, end) - start, cue.text)
@@ -0,0 +1,204 @@
+import email.utils
+import logging
+import mimetypes
+import os
+import re
+import secrets
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Oraliq to'g'ri yozilgan, lekin fayl ichiga tushmaydi (416)
+_UNSATISFIABLE = object()
+
+
+class _Link:
+    __slots__ = ("path", "filename", "expires")
+
+    def __init__(self, path, filename, expires):
+        self.path = path
+        self.filename = filename
+        self.expires = expires
+
+
+class _FileHandler(BaseHTTPRequestHandler):
+    """Faqat ro'yxatdan o'tgan fayllarni GET/HEAD bilan beradi (Range so'rovlari bilan)"""
+
+    server_version = "SubtitlerFiles/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _serve(self, send_body):
+        token = urllib.parse.urlsplit(self.path).path.strip("/").split("/")[0]
+        link = self.server.file_server.resolve(token)
+        if link is None:
+            self.send_error(404, "Havola topilmadi yoki muddati tugagan")
+            return
+        try:
+            f = open(link.path, "rb")
+        except OSError:
+            self.send_error(404, "Fayl topilmadi")
+            return
+
+        with f:
+            stat = os.fstat(f.fileno())
+            size = stat.st_size
+            # Natijalar noyob nom bilan bir marta yoziladi; vaqt emas, inode ishlatiladi,
+            # chunki tozalovchi uchun fayl vaqti yangilanib turadi
+            etag = f'"{stat.st_ino:x}-{size:x}"'
+            start, end = 0, size - 1
+            status = 200
+
+            byte_range = self.headers.get("Range")
+            # If-Range: fayl o'zgargan bo'lsa, to'xtatilgan yuklab olish boshidan boshlanadi
+            parsed = None
+            if byte_range and self.headers.get("If-Range", etag) == etag:
+                parsed = _parse_range(byte_range, size)
+            if parsed is not None:
+                if parsed is _UNSATISFIABLE:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                start, end = parsed
+                status = 206
+
+            length = max(0, end - start + 1)
+            self.send_response(status)
+            self.send_header("Content-Type", mimetypes.guess_type(link.filename)[0] or "application/octet-stream")
+            self.send_header("Content-Length", str(length))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+            self.send_header("Content-Disposition",
+                             f"attachment; filename*=UTF-8''{urllib.parse.quote(link.filename)}")
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+
+            if send_body and length:
+                try:
+                    # Fayl xotiraga o'qilmaydi: sendfile (bo'lmasa, bo'laklab nusxalash)
+                    self.connection.sendfile(f, start, length)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Mijoz yuklab olishni to'xtatdi - keyin Range bilan davom ettiradi
+                    self.close_connection = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def _parse_range(header, size):
+    """Bitta "bytes=" oralig'ini (boshlanish, oxir) ga aylantirish.
+
+    Qo'llab-quvvatlanmaydigan yoki noto'g'ri yozilgan sarlavha (masalan, bir
+    nechta oraliq) uchun None - RFC 9110 bo'yicha u e'tiborsiz qoldiriladi va
+    butun fayl beriladi. Fayl ichiga tushmaydigan oraliq uchun _UNSATISFIABLE.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        # "bytes=-500" - oxirgi 500 bayt
+        if int(last) == 0:
+            return _UNSATISFIABLE
+        start = max(0, size - int(last))
+        end = size - 1
+    else:
+        return None
+    if start >= size:
+        return _UNSATISFIABLE
+    return start, end
+
+
+class FileServer:
+    """Katta natija fayllarini brauzerga to'g'ridan-to'g'ri diskdan beruvchi mahalliy HTTP server.
+
+    Fayllar muddati cheklangan tasodifiy token bilan ro'yxatga olinadi;
+    boshqa hech qanday yo'l berilmaydi.
+    """
+
+    def __init__(self, host, port, public_url=None):
+        self._links = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), _FileHandler)
+        self._server.daemon_threads = True
+        self._server.file_server = self
+        bound_port = self._server.server_address[1]
+        self.public_url = (public_url or f"http://localhost:{bound_port}").rstrip("/")
+        self._thread = threading.Thread(target=self._server.serve_forever, name="file-server", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def register(self, path, filename=None, ttl_seconds=None):
+        """Fayl uchun vaqtinchalik havola yaratish; (url, tugash vaqti) qaytaradi"""
+        if ttl_seconds is None:
+            ttl_seconds = settings.FILE_LINK_TTL_MINUTES * 60
+        filename = filename or os.path.basename(path)
+        # Havolasi berilgan fayl ishchi katalog tozalovchisi uchun yangi hisoblanadi
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        expires = time.time() + ttl_seconds
+        token = secrets.token_urlsafe(24)
+        with self._lock:
+            now = time.time()
+            for old in [t for t, link in self._links.items() if link.expires <= now]:
+                del self._links[old]
+            self._links[token] = _Link(os.path.abspath(path), filename, expires)
+        return f"{self.public_url}/{token}/{urllib.parse.quote(filename)}", expires
+
+    def resolve(self, token):
+        with self._lock:
+            link = self._links.get(token)
+        if link is None or link.expires <= time.time():
+            return None
+        return link
+
+
+_server = None
+_server_lock = threading.Lock()
+_server_failed = False
+
+
+def get_file_server():
+    """Umumiy fayl serveri (o'chirilgan yoki ishga tushmagan bo'lsa None)"""
+    global _server, _server_failed
+    if settings.FILE_SERVER_PORT <= 0:
+        return None
+    with _server_lock:
+        if _server is None and not _server_failed:
+            try:
+                _server = FileServer(
+                    settings.FILE_SERVER_HOST, settings.FILE_SERVER_PORT, settings.FILE_SERVER_URL
+                ).start()
+            except OSError as e:
+                # Port band bo'lsa, natijalar odatdagidek Streamlit orqali beriladi
+                logger.warning("Fayl serverini ishga tushirib bo'lmadi: %s", e)
+                _server_failed = True
+        return _server
@@ -0,0 +1,201 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+_current_tracer = contextvars.ContextVar("subtitler_tracer", default=None)
+
+
+def _rss_mb():
+    """Jarayonning joriy RSS xotirasi, MB (/proc bo'lmagan tizimlarda None).
+
+    ru_maxrss jarayonning butun umridagi eng yuqori qiymat - birinchi model
+    yuklangandan keyin barcha bosqichlarda bir xil chiqadi, shuning uchun
+    bosqich boshi va oxirida joriy qiymat o'lchanadi.
+    """
+    try:
+        with open("/proc/self/statm", "r", encoding="ascii") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def _children_cpu():
+    # ffmpeg kabi tugagan bola jarayonlarning CPU vaqti
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Tracer:
+    """Bitta vazifa bosqichlarini Chrome trace formatida yozib boruvchi obyekt"""
+
+    def __init__(self, name):
+        self.name = name
+        self.events = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, name, start, wall, args):
+        event = {
+            "name": name,
+            "cat": "stage",
+            "ph": "X",
+            "ts": round((start - self._origin) * 1e6),
+            "dur": round(wall * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def to_chrome_trace(self):
+        with self._lock:
+            events = list(self.events)
+        metadata = {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": self.name}}
+        return {"traceEvents": [metadata] + events, "displayTimeUnit": "ms"}
+
+    def export(self, path):
+        """chrome://tracing yoki Perfetto da ochiladigan JSON faylni yozish"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+        return path
+
+
+class Metrics:
+    """Har bir bosqich bo'yicha oxirgi o'lchovlarning aylanma xulosasi"""
+
+    def __init__(self, window=200):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, wall, cpu, rss_mb, rss_delta_mb):
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.window)
+            samples.append((wall, cpu, rss_mb, rss_delta_mb))
+
+    def summary(self):
+        with self._lock:
+            snapshot = {key: list(samples) for key, samples in self._samples.items()}
+        result = {}
+        for key, samples in sorted(snapshot.items()):
+            walls = sorted(s[0] for s in samples)
+            rss = [s[2] for s in samples if s[2] is not None]
+            deltas = [s[3] for s in samples if s[3] is not None]
+            result[key] = {
+                "count": len(walls),
+                "mean_s": sum(walls) / len(walls),
+                "p50_s": walls[len(walls) // 2],
+                "p95_s": walls[min(len(walls) - 1, int(len(walls) * 0.95))],
+                "max_s": walls[-1],
+                "cpu_mean_s": sum(s[1] for s in samples) / len(samples),
+                "rss_mb": max(rss) if rss else None,
+                "rss_delta_max_mb": max(deltas) if deltas else None,
+            }
+        return result
+
+    def export(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def tracing(name):
+    """Shu kontekstdagi barcha bosqichlarni yangi Tracer ga yozish"""
+    tracer = Tracer(name)
+    token = _current_tracer.set(tracer)
+    try:
+        yield tracer
+    finally:
+        _current_tracer.reset(token)
+
+
+@contextmanager
+def stage(name, **args):
+    """Bosqichning devor vaqti, CPU vaqti va RSS xotirasini o'lchash.
+
+    Natija joriy Tracer ga (bo'lsa) va umumiy `metrics` ga yoziladi.
+    `model` argumenti berilsa, xulosa model o'lchami bo'yicha ajratiladi.
+
+    cpu_s - faqat chaqiruvchi oqimning CPU vaqti; process_cpu_s - jarayonning
+    barcha oqimlari (torch ichki oqimlari ham), lekin shu vaqtda parallel
+    ishlayotgan boshqa bosqichlarni ham o'z ichiga oladi. Xulosaga
+    process_cpu_s va bola jarayonlar (ffmpeg) vaqti yoziladi. rss_mb -
+    bosqich boshi va oxiridagi joriy RSS ning kattasi, rss_delta_mb - farqi.
+    """
+    finish = start_stage(name, **args)
+    try:
+        yield
+    except BaseException:
+        finish(failed=True)
+        raise
+    finish()
+
+
+def start_stage(name, **args):
+    """stage() ning qo'lda yakunlanadigan varianti; yakunlash funksiyasini qaytaradi.
+
+    Bitta `with` blokiga sig'maydigan bosqichlar uchun (masalan, butun
+    Streamlit skripti). Yakunlash funksiyasi shu oqimda chaqirilishi kerak.
+    """
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    process_start = time.process_time()
+    children_start = _children_cpu()
+    rss_start = _rss_mb()
+
+    def finish(failed=False):
+        wall = time.perf_counter() - start
+        thread_cpu = time.thread_time() - cpu_start
+        process_cpu = time.process_time() - process_start
+        child_cpu = _children_cpu() - children_start
+        rss_end = _rss_mb()
+        rss = max(rss_start, rss_end) if rss_end is not None else None
+        rss_delta = rss_end - rss_start if rss_end is not None else None
+        key = f"{name}[{args['model']}]" if "model" in args else name
+        metrics.record(key, wall, process_cpu + child_cpu, rss, rss_delta)
+
+        tracer = _current_tracer.get()
+        if tracer is not None:
+            event_args = dict(args)
+            event_args.update({
+                "wall_s": round(wall, 4),
+                "cpu_s": round(thread_cpu, 4),
+                "process_cpu_s": round(process_cpu, 4),
+                "child_cpu_s": round(child_cpu, 4),
+                "rss_mb": round(rss, 1) if rss is not None else None,
+                "rss_delta_mb": round(rss_delta, 1) if rss_delta is not None else None,
+            })
+            if failed:
+                event_args["failed"] = True
+            tracer.add(name, start, wall, event_args)
+        logger.debug("%s: %.3f s (cpu %.3f s)", key, wall, process_cpu + child_cpu)
+
+    return finish
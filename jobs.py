@@ -0,0 +1,222 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from instrumentation import metrics, tracing
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Joriy oqimda (va uning kontekstidan nusxalangan oqimlarda) bajarilayotgan vazifa
+_current_job = contextvars.ContextVar("subtitler_job", default=None)
+
+
+class JobCancelled(Exception):
+    """Vazifa foydalanuvchi tomonidan bekor qilindi"""
+
+
+def check_cancelled():
+    """Joriy vazifa bekor qilingan bo'lsa JobCancelled; vazifadan tashqarida hech narsa qilmaydi"""
+    job = _current_job.get()
+    if job is not None:
+        job.check_cancelled()
+
+
+class Job:
+    """Fonda bajariladigan bitta vazifa (transkripsiya, tarjima, subtitl biriktirish)"""
+
+    def __init__(self, job_id, kind, manager):
+        self.id = job_id
+        self.kind = kind
+        self.status = QUEUED
+        self.progress = 0
+        self.messages = []
+        self.result = None
+        self.error = None
+        self.trace_path = None
+        self.created = time.time()
+        self.updated = self.created
+        self._manager = manager
+        self._cancel_event = threading.Event()
+        self._future = None
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATES
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def progress_callback(self, p):
+        """Jarayon foizini yangilash; bekor qilingan bo'lsa JobCancelled ko'taradi"""
+        self.check_cancelled()
+        p = int(p)
+        if p != self.progress:
+            self.progress = p
+            self._manager._persist(self)
+
+    def log(self, message, level="info"):
+        self.messages.append((level, message))
+        self._manager._persist(self)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "messages": self.messages,
+            "result": self.result,
+            "error": self.error,
+            "trace_path": self.trace_path,
+            "created": self.created,
+            "updated": self.updated,
+        }
+
+
+class JobManager:
+    """Barcha sessiyalar uchun umumiy, cheklangan ishchilar soniga ega vazifalar navbati"""
+
+    def __init__(self, max_workers, state_dir):
+        self.state_dir = state_dir
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="subtitler-job")
+        os.makedirs(state_dir, exist_ok=True)
+        self._mark_interrupted()
+
+    def submit(self, kind, target, *args, **kwargs):
+        """Vazifani navbatga qo'yish; `target(job, *args, **kwargs)` fonda chaqiriladi"""
+        job = Job(uuid.uuid4().hex[:12], kind, self)
+        with self._lock:
+            # Bir kundan oldin tugagan vazifalar xotiradan chiqariladi (holati diskda qoladi)
+            cutoff = time.time() - 86400
+            for old_id in [i for i, j in self._jobs.items() if j.finished and j.updated < cutoff]:
+                del self._jobs[old_id]
+            self._jobs[job.id] = job
+        self._persist(job)
+        job._future = self._executor.submit(self._run, job, target, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        """Vazifani olish; xotirada bo'lmasa, diskdagi holati (faqat o'qish uchun)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        data = self._load(job_id)
+        if data is None:
+            return None
+        job = Job(data["id"], data["kind"], self)
+        for field in ("status", "progress", "result", "error", "trace_path", "created", "updated"):
+            setattr(job, field, data.get(field))
+        job.messages = [tuple(m) for m in data.get("messages", [])]
+        return job
+
+    def cancel(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        job._cancel_event.set()
+        # Hali boshlanmagan vazifa darhol bekor qilinadi
+        if job._future is not None and job._future.cancel():
+            job.status = CANCELLED
+            self._persist(job)
+        return True
+
+    def _run(self, job, target, args, kwargs):
+        if job.cancel_requested:
+            job.status = CANCELLED
+            self._persist(job)
+            return
+        job.status = RUNNING
+        self._persist(job)
+        # Vazifa ichidagi barcha bosqichlar (shu jumladan ichki oqimlardagi) bitta trace ga yoziladi
+        with tracing(f"{job.kind} {job.id}") as tracer:
+            token = _current_job.set(job)
+            try:
+                job.result = target(job, *args, **kwargs)
+                job.check_cancelled()
+                job.status = DONE
+                job.progress = 100
+            except JobCancelled:
+                job.status = CANCELLED
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+                logger.exception("Vazifa %s xatolik bilan tugadi", job.id)
+            finally:
+                _current_job.reset(token)
+                self._export_trace(job, tracer)
+                self._persist(job)
+
+    def _export_trace(self, job, tracer):
+        try:
+            job.trace_path = tracer.export(os.path.join(self.state_dir, "traces", f"{job.id}.json"))
+            metrics.export(os.path.join(settings.CACHE_DIR, "metrics.json"))
+        except Exception as e:
+            logger.warning("Trace faylini saqlashda xatolik: %s", e)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    def _persist(self, job):
+        job.updated = time.time()
+        path = self._state_path(job.id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(job.to_dict(), f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning("Vazifa holatini saqlashda xatolik: %s", e)
+
+    def _load(self, job_id):
+        try:
+            with open(self._state_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _mark_interrupted(self):
+        # Avvalgi jarayon to'xtaganda tugallanmay qolgan vazifalar
+        for name in os.listdir(self.state_dir):
+            if not name.endswith(".json"):
+                continue
+            data = self._load(name[:-len(".json")])
+            if data and data.get("status") not in FINISHED_STATES:
+                data["status"] = FAILED
+                data["error"] = "Server qayta ishga tushgani sababli vazifa to'xtatildi"
+                with open(self._state_path(data["id"]), "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(settings.JOB_WORKERS, os.path.join(settings.CACHE_DIR, "jobs"))
+        return _manager
@@ -0,0 +1,283 @@
+import gc
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import settings
+from instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# Har bir model uchun taxminiy xotira talabi (MB), Whisper hujjatlari asosida
+MODEL_MEMORY_MB = {
+    "tiny": 1024,
+    "base": 1024,
+    "small": 2048,
+    "medium": 5120,
+    "large": 10240,
+}
+
+
+# int8 kvantlangan chiziqli qatlamlar bilan modelning taxminiy xotira ulushi
+QUANTIZED_MEMORY_RATIO = 0.5
+
+
+def estimate_model_memory_mb(model_size, quantize=None):
+    """Model uchun kerakli xotirani taxminan hisoblash"""
+    # "medium.en", "large-v3" kabi nomlarni asosiy o'lchamga keltirish
+    base_name = model_size.split(".")[0].split("-")[0]
+    size_mb = MODEL_MEMORY_MB.get(base_name, MODEL_MEMORY_MB["large"])
+    if quantize:
+        size_mb = int(size_mb * QUANTIZED_MEMORY_RATIO)
+    return size_mb
+
+
+def resolve_quantize(quantize=None):
+    """Kvantlash turini aniqlash: "int8" yoki None (float32); None berilsa sozlamadan olinadi"""
+    if quantize is None:
+        quantize = settings.QUANTIZE
+    quantize = (quantize or "").strip().lower()
+    if quantize in ("", "none", "off", "0", "float32"):
+        return None
+    if quantize != "int8":
+        raise ValueError(f"Noma'lum kvantlash turi: {quantize}")
+    return quantize
+
+
+def model_key(model_size, quantize=None):
+    """Registr kaliti: kvantlangan va oddiy model alohida saqlanadi"""
+    return f"{model_size}:{quantize}" if quantize else model_size
+
+
+_interop_configured = False
+_intra_configured = False
+
+
+def configure_torch_threads(intra_op=None, inter_op=None):
+    """torch oqimlari sonini sozlash (0 yoki None - o'zgartirilmaydi).
+
+    intra-op soni jarayon bo'yicha umumiy bo'lib, har bir chaqiruvda
+    yangilanadi. inter-op sonini torch faqat birinchi parallel ishdan oldin
+    qabul qiladi, shuning uchun u jarayonda bir marta o'rnatiladi.
+    """
+    global _interop_configured, _intra_configured
+    import torch
+    if intra_op:
+        torch.set_num_threads(intra_op)
+        _intra_configured = True
+    if inter_op and not _interop_configured:
+        try:
+            torch.set_num_interop_threads(inter_op)
+        except RuntimeError as e:
+            logger.warning("inter-op oqimlar sonini o'zgartirib bo'lmadi: %s", e)
+        _interop_configured = True
+
+
+def quantize_model(model):
+    """Modelning chiziqli qatlamlarini dinamik int8 kvantlash (faqat CPU uchun)"""
+    import torch
+    import whisper.model
+
+    # Whisper o'z Linear sinfidan foydalanadi; quantize_dynamic esa qatlamlarni
+    # aniq turi bo'yicha tanlaydi. float32 da ularning forward i bir xil
+    for module in model.modules():
+        if isinstance(module, whisper.model.Linear):
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_whisper_model(model_size, quantize=None):
+    """Whisper modelini yuklash; kvantlangan variant diskdagi keshdan olinadi yoki yaratiladi"""
+    # whisper (va torch) faqat birinchi model yuklanganda import qilinadi
+    import torch
+    import whisper
+
+    # Umumiy sozlama faqat standart qiymat: vazifa yoki ishchi jarayon o'rnatgan
+    # oqimlar sonini birinchi yuklash ustidan yozib yubormaydi
+    configure_torch_threads(None if _intra_configured else settings.TORCH_THREADS, settings.TORCH_INTEROP_THREADS)
+    if not quantize:
+        return whisper.load_model(model_size)
+
+    cache_dir = os.path.join(settings.CACHE_DIR, "models")
+    # torch versiyasi o'zgarsa, saqlangan kvantlangan og'irliklar mos kelmasligi mumkin
+    path = os.path.join(cache_dir, f"{model_size}-{quantize}-torch{torch.__version__}.pt")
+    if os.path.exists(path):
+        try:
+            with stage("model_load_cached", model=model_key(model_size, quantize)):
+                # Butun model obyekti saqlangan (faqat o'zimiz yozgan fayl)
+                model = torch.load(path, map_location="cpu", weights_only=False)
+            model.eval()
+            return model
+        except Exception as e:
+            logger.warning("Kvantlangan modelni o'qib bo'lmadi, qayta yaratiladi: %s", e)
+
+    model = quantize_model(whisper.load_model(model_size, device="cpu"))
+    model.eval()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning("Kvantlangan modelni saqlab bo'lmadi: %s", e)
+    return model
+
+
+class _Entry:
+    __slots__ = ("model", "size_mb", "users", "lock")
+
+    def __init__(self, size_mb):
+        self.model = None
+        self.size_mb = size_mb
+        self.users = 0
+        # Whisper dekoderi modelga hook o'rnatadi, shuning uchun bitta
+        # model bir vaqtda faqat bitta transkripsiyada ishlatiladi
+        self.lock = threading.Lock()
+
+
+class ModelLease:
+    """Registrdan olingan modelni ishlatish uchun ijara obyekti"""
+
+    def __init__(self, registry, key, entry):
+        self._registry = registry
+        self._key = key
+        self._entry = entry
+
+    @property
+    def model(self):
+        return self._entry.model
+
+    @property
+    def size(self):
+        return self._key
+
+    def __enter__(self):
+        self._entry.lock.acquire()
+        return self._entry.model
+
+    def __exit__(self, exc_type, exc, tb):
+        self._entry.lock.release()
+        self._registry._release(self._entry)
+        return False
+
+
+class ModelRegistry:
+    """Jarayon bo'yicha umumiy Whisper modellari keshi (LRU, xotira byudjeti bilan)"""
+
+    def __init__(self, budget_mb):
+        self.budget_mb = budget_mb
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def loaded_models(self):
+        with self._lock:
+            return [key for key, entry in self._entries.items() if entry.model is not None]
+
+    def used_memory_mb(self):
+        with self._lock:
+            return sum(e.size_mb for e in self._entries.values() if e.model is not None)
+
+    def lease(self, model_size, quantize=None):
+        """Modelni keshdan olish yoki yuklash; ModelLease qaytaradi"""
+        quantize = resolve_quantize(quantize)
+        key = model_key(model_size, quantize)
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Bir xil modelni parallel ravishda ikki marta yuklamaslik uchun
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry.model is not None:
+                    self._entries.move_to_end(key)
+                    entry.users += 1
+                    return ModelLease(self, key, entry)
+
+                size_mb = estimate_model_memory_mb(model_size, quantize)
+                self._make_room(size_mb)
+
+            with stage("model_load", model=key):
+                model = load_whisper_model(model_size, quantize)
+
+            with self._lock:
+                entry = _Entry(size_mb)
+                entry.model = model
+                entry.users = 1
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                return ModelLease(self, key, entry)
+
+    def get_model(self, model_size, quantize=None):
+        """Modelni yuklab, uni keshda qoldirish (oldindan yuklash uchun)"""
+        lease = self.lease(model_size, quantize)
+        self._release(lease._entry)
+        return lease.model
+
+    def clear(self):
+        """Ishlatilmayotgan barcha modellarni xotiradan chiqarish"""
+        with self._lock:
+            for key in [k for k, e in self._entries.items() if e.users == 0]:
+                self._entries.pop(key).model = None
+        gc.collect()
+
+    def _release(self, entry):
+        with self._lock:
+            entry.users = max(0, entry.users - 1)
+
+    def _make_room(self, needed_mb):
+        # self._lock ushlab turilgan holda chaqiriladi
+        used = sum(e.size_mb for e in self._entries.values() if e.model is not None)
+        evicted = False
+        for key in list(self._entries.keys()):
+            if used + needed_mb <= self.budget_mb:
+                break
+            entry = self._entries[key]
+            if entry.users > 0 or entry.model is None:
+                continue
+            # Eng uzoq ishlatilmagan modelni chiqarib yuborish
+            del self._entries[key]
+            entry.model = None
+            used -= entry.size_mb
+            evicted = True
+        if evicted:
+            gc.collect()
+
+
+_registry = ModelRegistry(settings.MODEL_MEMORY_BUDGET_MB)
+_preload_lock = threading.Lock()
+_preloaded = set()
+
+
+def get_registry():
+    return _registry
+
+
+def lease_model(model_size, quantize=None):
+    """Umumiy registrdan modelni ijaraga olish"""
+    return _registry.lease(model_size, quantize)
+
+
+def preload_models(model_sizes, background=True):
+    """Tanlangan modellarni oldindan yuklash (har bir jarayonda bir marta)"""
+    with _preload_lock:
+        pending = [m for m in model_sizes if m not in _preloaded]
+        _preloaded.update(pending)
+    if not pending:
+        return None
+
+    def _load_all():
+        for model_size in pending:
+            try:
+                _registry.get_model(model_size)
+            except Exception as e:
+                logger.warning("Modelni oldindan yuklashda xatolik (%s): %s", model_size, e)
+
+    if not background:
+        _load_all()
+        return None
+
+    thread = threading.Thread(target=_load_all, name="whisper-preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import threading
+from collections import OrderedDict, namedtuple
+
+import settings
+from result_cache import evict_oldest
+
+logger = logging.getLogger(__name__)
+
+# Xotirada saqlanadigan natijalar soni (diskdagi kesh SUBTITLER_PROBE_CACHE_MAX_MB bilan cheklanadi)
+MEMORY_ENTRIES = 128
+
+# Format va oqimlar: faqat fayl sarlavhasi o'qiladi, katta faylda ham bir zumda
+SHOW_ENTRIES = (
+    "format=duration,bit_rate,size,format_name"
+    ":stream=index,codec_type,codec_name,width,height,avg_frame_rate,channels,sample_rate,bit_rate"
+    ":stream_tags=language"
+)
+
+_MediaInfo = namedtuple("MediaInfo", ["duration", "bit_rate", "size", "format_name", "streams", "keyframes"])
+
+
+class MediaInfo(_MediaInfo):
+    """Media haqida ma'lumot: davomiylik (s), bitreyt, oqimlar va birinchi video oqimi kalit kadrlari (s).
+
+    Kalit kadrlar butun faylni o'qishni talab qiladi, shuning uchun ular faqat
+    so'ralganda yig'iladi; ungacha `keyframes` None bo'ladi.
+    """
+
+    __slots__ = ()
+
+    @property
+    def video(self):
+        return next((s for s in self.streams if s["type"] == "video"), None)
+
+    @property
+    def audio(self):
+        return next((s for s in self.streams if s["type"] == "audio"), None)
+
+    def to_dict(self):
+        return self._asdict()
+
+
+def _number(value, cast=float):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _frame_rate(value):
+    num, _, den = (value or "").partition("/")
+    num, den = _number(num), _number(den or 1)
+    return round(num / den, 3) if num and den else None
+
+
+def parse_ffprobe_output(text):
+    """ffprobe ning compact chiqishini (format va oqimlar) MediaInfo ga aylantirish"""
+    fmt = {}
+    streams = []
+    for line in text.splitlines():
+        section, _, rest = line.partition("|")
+        fields = dict(item.partition("=")[::2] for item in rest.split("|") if "=" in item)
+        if section == "stream":
+            streams.append({
+                "index": _number(fields.get("index"), int),
+                "type": fields.get("codec_type"),
+                "codec": fields.get("codec_name"),
+                "width": _number(fields.get("width"), int),
+                "height": _number(fields.get("height"), int),
+                "fps": _frame_rate(fields.get("avg_frame_rate")),
+                "channels": _number(fields.get("channels"), int),
+                "sample_rate": _number(fields.get("sample_rate"), int),
+                "bit_rate": _number(fields.get("bit_rate"), int),
+                "language": fields.get("tag:language"),
+            })
+        elif section == "format":
+            fmt = fields
+    return MediaInfo(
+        duration=_number(fmt.get("duration")),
+        bit_rate=_number(fmt.get("bit_rate"), int),
+        size=_number(fmt.get("size"), int),
+        format_name=fmt.get("format_name"),
+        streams=streams,
+        keyframes=None,
+    )
+
+
+def _ffprobe_path():
+    # subtitler bu modulni import qiladi, shuning uchun ffprobe yo'li chaqiruv paytida olinadi
+    from subtitler import get_ffprobe_path
+    return get_ffprobe_path()
+
+
+def run_ffprobe(path):
+    """Format va oqimlar haqidagi ma'lumotni yig'ish (kalit kadrlarsiz)"""
+    cmd = [
+        _ffprobe_path(), "-v", "error", "-show_entries", SHOW_ENTRIES,
+        "-of", "compact", path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True, timeout=60)
+    return parse_ffprobe_output(result.stdout)
+
+
+def scan_keyframes(path):
+    """Birinchi video oqimi kalit kadrlarining vaqtlari (soniya, o'sish tartibida).
+
+    Paketlar ro'yxati uzun videoda o'nlab MB bo'ladi: chiqish qatorma-qator
+    o'qiladi va faqat kalit kadr vaqtlari saqlanadi.
+    """
+    cmd = [
+        _ffprobe_path(), "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path
+    ]
+    keyframes = []
+    # stderr o'qilmaydi: to'lib qolgan quvur ffprobe ni to'xtatib qo'yardi
+    with subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True) as process:
+        for line in process.stdout:
+            pts, _, flags = line.rstrip().partition(",")
+            if "K" in flags and pts not in ("", "N/A"):
+                keyframes.append(float(pts))
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd)
+    keyframes.sort()
+    return keyframes
+
+
+class ProbeCache:
+    """ffprobe natijalari keshi: kontent xeshi yoki yo'l + hajm + o'zgartirilgan vaqt bo'yicha"""
+
+    def __init__(self, root=None, memory_entries=MEMORY_ENTRIES, max_bytes=None):
+        self.root = root
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def make_key(path, content_hash=None):
+        if content_hash:
+            return content_hash
+        # Xesh ma'lum bo'lmasa, fayl o'zgarsa kalit ham o'zgaradi
+        stat = os.stat(path)
+        payload = f"{os.path.realpath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, path, content_hash=None, keyframes=False):
+        """Keshlangan ma'lumot; `keyframes` False bo'lsa, kalit kadrlar yig'ilmaydi (None bo'lishi mumkin)"""
+        key = self.make_key(path, content_hash)
+        with self._lock:
+            info = self._memory.get(key)
+            if info is not None and (info.keyframes is not None or not keyframes):
+                self._memory.move_to_end(key)
+                return info
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Bir faylni parallel so'rovlar bir marta tekshiradi
+        with key_lock:
+            info = self._memory.get(key) or self._load(key)
+            changed = info is None
+            if info is None:
+                info = run_ffprobe(path)
+            if keyframes and info.keyframes is None:
+                info = info._replace(keyframes=scan_keyframes(path) if info.video else [])
+                changed = True
+            if changed:
+                self._save(key, info)
+            with self._lock:
+                self._memory[key] = info
+                self._memory.move_to_end(key)
+                while len(self._memory) > self.memory_entries:
+                    self._memory.popitem(last=False)
+                self._key_locks.pop(key, None)
+            return info
+
+    def _file(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def _load(self, key):
+        if not self.root:
+            return None
+        path = self._file(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                info = MediaInfo(**json.load(f))
+            # LRU uchun oxirgi ishlatilgan vaqtni yangilash
+            os.utime(path, None)
+            return info
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _save(self, key, info):
+        if not self.root:
+            return
+        path = self._file(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(info.to_dict(), f)
+            os.replace(tmp_path, path)
+            if self.max_bytes:
+                evict_oldest(self.root, self.max_bytes)
+        except OSError as e:
+            logger.warning("Media ma'lumotini keshga saqlab bo'lmadi: %s", e)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_probe_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ProbeCache(os.path.join(settings.CACHE_DIR, "probe"),
+                                    max_bytes=settings.PROBE_CACHE_MAX_MB * 1024 * 1024)
+            except OSError as e:
+                # Diskka yozib bo'lmasa, faqat xotiradagi kesh
+                logger.warning("Media ma'lumotlari keshini ochib bo'lmadi: %s", e)
+                _cache = ProbeCache(None)
+        return _cache
+
+
+def probe_media(path, content_hash=None, keyframes=False):
+    """Media haqida ma'lumot (keshdan yoki ffprobe bilan); xatolikda istisno.
+
+    Standart holatda faqat format va oqimlar: UI va konteyner tanlash uchun
+    arzon. Kalit kadrlar `keyframes=True` bilan, bo'lish kerak bo'lganda
+    (fon vazifasida) yig'iladi.
+    """
+    return get_probe_cache().get(path, content_hash, keyframes)
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """Media xeshi, model va sozlamalar bo'yicha transkripsiya natijalari keshi"""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash, model_size, options=None):
+        payload = json.dumps(
+            {"media": content_hash, "model": model_size, "options": options or {}},
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.srt")
+
+    def fetch(self, key, dest_path):
+        """Keshdagi SRT ni `dest_path` ga nusxalash; topilmasa None"""
+        path = self._path(key)
+        try:
+            shutil.copyfile(path, dest_path)
+            # LRU uchun oxirgi ishlatilgan vaqtni yangilash
+            os.utime(path, None)
+        except FileNotFoundError:
+            return None
+        return dest_path
+
+    def store(self, key, srt_path):
+        """Tayyor SRT faylni keshga saqlash"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.copyfile(srt_path, tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Disk byudjetidan oshgan eng eski natijalarni o'chirish"""
+        with self._lock:
+            evict_oldest(self.root, self.max_bytes)
+
+
+def evict_oldest(root, max_bytes):
+    """Katalogdagi fayllar `max_bytes` dan oshsa, eng uzoq ishlatilmaganlarini o'chirish (LRU)"""
+    entries = []
+    total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            # Yarim qolgan vaqtinchalik fayllar bir soatdan keyin tozalanadi
+            if name.endswith(".tmp") and stat.st_mtime > time.time() - 3600:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+    if total <= max_bytes:
+        return
+    for _, size, path in sorted(entries):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Umumiy natijalar keshi (o'chirilgan bo'lsa None)"""
+    global _cache
+    if not settings.RESULT_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ResultCache(
+                    os.path.join(settings.CACHE_DIR, "transcripts"),
+                    settings.RESULT_CACHE_MAX_MB * 1024 * 1024,
+                )
+            except Exception as e:
+                logger.warning("Natijalar keshini ochib bo'lmadi: %s", e)
+                return None
+        return _cache
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+class SegmentCache:
+    """Qisman qayta biriktirish uchun kodlangan video bo'laklari keshi.
+
+    Har bir yozuv (video xeshi + kodlash sozlamalari) alohida katalogda
+    saqlanadi: bo'lish nuqtalari manifestda, bo'laklar esa subtitllari
+    xeshi bilan nomlangan fayllarda. O'zgarmagan bo'lak qayta kodlanmaydi.
+    """
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entry_locks = {}
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def make_key(content_hash, options=None):
+        payload = json.dumps({"media": content_hash, "options": options or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def entry_lock(self, key):
+        """Bitta yozuvni bir vaqtda faqat bitta vazifa o'zgartiradi"""
+        with self._lock:
+            return self._entry_locks.setdefault(key, threading.Lock())
+
+    def entry_dir(self, key):
+        path = os.path.join(self.root, key)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def load_manifest(self, key):
+        try:
+            with open(os.path.join(self.root, key, MANIFEST_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_manifest(self, key, manifest):
+        """Manifestni saqlash va unda ko'rsatilmagan eski bo'laklarni o'chirish"""
+        entry_dir = self.entry_dir(key)
+        path = os.path.join(entry_dir, MANIFEST_NAME)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, path)
+
+        keep = set(manifest.get("segments", [])) | {MANIFEST_NAME}
+        for name in os.listdir(entry_dir):
+            if name not in keep:
+                try:
+                    os.remove(os.path.join(entry_dir, name))
+                except OSError:
+                    pass
+
+    def evict(self):
+        """Disk byudjetidan oshgan eng eski yozuvlarni butunlay o'chirish"""
+        entries = []
+        total = 0
+        for key in os.listdir(self.root):
+            entry_dir = os.path.join(self.root, key)
+            if not os.path.isdir(entry_dir):
+                continue
+            size = 0
+            for name in os.listdir(entry_dir):
+                try:
+                    size += os.path.getsize(os.path.join(entry_dir, name))
+                except OSError:
+                    pass
+            try:
+                used = os.path.getmtime(os.path.join(entry_dir, MANIFEST_NAME))
+            except OSError:
+                used = 0
+            entries.append((used, size, key))
+            total += size
+
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            lock = self.entry_lock(key)
+            # Hozir ishlatilayotgan yozuv o'chirilmaydi
+            if not lock.acquire(blocking=False):
+                continue
+            try:
+                shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            finally:
+                lock.release()
+            total -= size
+            logger.info("Bo'laklar keshidan yozuv o'chirildi: %s", key)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_segment_cache():
+    """Umumiy bo'laklar keshi (o'chirilgan bo'lsa None)"""
+    global _cache
+    if settings.SEGMENT_CACHE_MAX_MB <= 0:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = SegmentCache(
+                    os.path.join(settings.CACHE_DIR, "segments"),
+                    settings.SEGMENT_CACHE_MAX_MB * 1024 * 1024,
+                )
+            except Exception as e:
+                logger.warning("Bo'laklar keshini ochib bo'lmadi: %s", e)
+                return None
+        return _cache
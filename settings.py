@@ -0,0 +1,100 @@
+import os
+import tempfile
+
+# Muhit o'zgaruvchilari orqali sozlanadigan parametrlar
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def _env_list(name):
+    value = os.environ.get(name, "")
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+# Whisper modellari uchun ajratilgan xotira (MB)
+MODEL_MEMORY_BUDGET_MB = _env_int("SUBTITLER_MODEL_BUDGET_MB", 8192)
+
+# Dastur ishga tushganda oldindan yuklanadigan modellar, masalan: "base,medium"
+PRELOAD_MODELS = _env_list("SUBTITLER_PRELOAD_MODELS")
+
+# Tarjima xizmati: bo'sh bo'lsa Google, aks holda LibreTranslate mos URL
+TRANSLATE_BACKEND_URL = os.environ.get("SUBTITLER_TRANSLATE_URL", "")
+
+# Parallel tarjima so'rovlari soni va soniyasiga so'rovlar cheklovi
+TRANSLATE_WORKERS = _env_int("SUBTITLER_TRANSLATE_WORKERS", 4)
+TRANSLATE_RATE = _env_int("SUBTITLER_TRANSLATE_RATE", 5)
+
+# Keshlar (tarjima xotirasi va boshqalar) saqlanadigan katalog
+CACHE_DIR = os.environ.get(
+    "SUBTITLER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "subtitler"),
+)
+
+# Tarjima xotirasi: o'chirish uchun "0" qo'ying
+TRANSLATION_MEMORY_ENABLED = os.environ.get("SUBTITLER_TRANSLATION_MEMORY", "1") != "0"
+TRANSLATION_MEMORY_MAX_ENTRIES = _env_int("SUBTITLER_TM_MAX_ENTRIES", 200000)
+TRANSLATION_MEMORY_MAX_AGE_DAYS = _env_int("SUBTITLER_TM_MAX_AGE_DAYS", 180)
+
+# Katta videolarni parallel transkripsiya qilish jarayonlari soni (0 - avtomatik)
+TRANSCRIBE_WORKERS = _env_int("SUBTITLER_TRANSCRIBE_WORKERS", 0)
+
+# Transkripsiya natijalari keshi: o'chirish uchun "0" qo'ying
+RESULT_CACHE_ENABLED = os.environ.get("SUBTITLER_RESULT_CACHE", "1") != "0"
+RESULT_CACHE_MAX_MB = _env_int("SUBTITLER_RESULT_CACHE_MAX_MB", 2048)
+
+# Media ma'lumotlari (ffprobe) keshining disk byudjeti
+PROBE_CACHE_MAX_MB = _env_int("SUBTITLER_PROBE_CACHE_MAX_MB", 64)
+
+# Fon vazifalari uchun umumiy ishchi oqimlar soni (barcha sessiyalar uchun)
+JOB_WORKERS = _env_int("SUBTITLER_JOB_WORKERS", 2)
+
+# Qattiq biriktirishda ffmpeg ishlatadigan oqimlar soni (0 - barcha yadrolar)
+BURN_THREADS = _env_int("SUBTITLER_BURN_THREADS", 0)
+
+# Bo'laklab parallel biriktirishdagi bo'laklar soni (0 - yadrolar soni)
+BURN_SEGMENTS = _env_int("SUBTITLER_BURN_SEGMENTS", 0)
+
+# Log darajasi (DEBUG da har bir bosqich vaqti ham yoziladi)
+LOG_LEVEL = os.environ.get("SUBTITLER_LOG_LEVEL", "INFO")
+
+# Qisman qayta biriktirish: bo'laklar keshi hajmi (0 - o'chirilgan) va bo'lak uzunligi
+SEGMENT_CACHE_MAX_MB = _env_int("SUBTITLER_SEGMENT_CACHE_MAX_MB", 8192)
+INCREMENTAL_SEGMENT_SECONDS = _env_int("SUBTITLER_INCREMENTAL_SEGMENT_SECONDS", 20)
+
+# CPU da Whisper: "int8" - chiziqli qatlamlarni dinamik kvantlash (bo'sh - float32)
+QUANTIZE = os.environ.get("SUBTITLER_QUANTIZE", "")
+
+# torch intra-op va inter-op oqimlari soni (0 - torch standarti)
+TORCH_THREADS = _env_int("SUBTITLER_TORCH_THREADS", 0)
+TORCH_INTEROP_THREADS = _env_int("SUBTITLER_TORCH_INTEROP_THREADS", 0)
+
+# Transkripsiyadan oldin sukunatni tashlab yuborish (VAD): o'chirish uchun "0" qo'ying
+VAD_ENABLED = os.environ.get("SUBTITLER_VAD", "1") != "0"
+
+# Bir vaqtda kodlanadigan/dekodlanadigan 30 soniyalik oynalar soni (1 - model.transcribe)
+DECODE_BATCH_SIZE = _env_int("SUBTITLER_DECODE_BATCH_SIZE", 1)
+
+# Sessiya va vazifalar ishchi kataloglari: disk byudjeti va fayllar saqlanadigan muddat
+WORKSPACE_DIR = os.environ.get(
+    "SUBTITLER_WORKSPACE_DIR",
+    os.path.join(tempfile.gettempdir(), "subtitler-workspace"),
+)
+WORKSPACE_MAX_MB = _env_int("SUBTITLER_WORKSPACE_MAX_MB", 20480)
+WORKSPACE_TTL_HOURS = _env_int("SUBTITLER_WORKSPACE_TTL_HOURS", 24)
+
+# Katta natijalarni diskdan to'g'ridan-to'g'ri beruvchi fayl serveri (0 - o'chirilgan).
+# Teskari proksi ortida bo'lsa, SUBTITLER_FILE_SERVER_URL - brauzer ko'radigan manzil
+FILE_SERVER_PORT = _env_int("SUBTITLER_FILE_SERVER_PORT", 8502)
+FILE_SERVER_HOST = os.environ.get("SUBTITLER_FILE_SERVER_HOST", "0.0.0.0")
+FILE_SERVER_URL = os.environ.get("SUBTITLER_FILE_SERVER_URL", "")
+FILE_LINK_TTL_MINUTES = _env_int("SUBTITLER_FILE_LINK_TTL_MINUTES", 60)
+# Shundan katta fayllar havola orqali, kichiklari esa st.download_button bilan beriladi
+FILE_LINK_MIN_MB = _env_int("SUBTITLER_FILE_LINK_MIN_MB", 20)
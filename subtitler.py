@@ -1,12 +1,40 @@
 import os
+import json
+import time
+import math
+import hashlib
 import tempfile
 import subprocess
-import whisper
-from deep_translator import GoogleTranslator
 import shutil
+import logging
+import functools
+import contextlib
+import contextvars
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
+import numpy as np
+
+import cues
+import settings
+from batched_decoding import resolve_batch_size, transcribe_batched
+from instrumentation import stage
+from jobs import JobCancelled, check_cancelled
+from probe import probe_media
+from model_registry import (
+    configure_torch_threads, estimate_model_memory_mb, lease_model, model_key, resolve_quantize,
+)
+from result_cache import get_result_cache
+from segment_cache import get_segment_cache
+from translator import get_default_engine
+from uploads import file_sha256
+from vad import MAX_SPEECH_RATIO, compact_speech, detect_speech, resolve_vad, speech_ratio
+
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=None)
 def get_ffmpeg_path():
-    # FFmpeg ni avtomatik topish
+    # FFmpeg ni avtomatik topish (natija jarayon davomida eslab qolinadi)
     ffmpeg_path = shutil.which("ffmpeg")
     if ffmpeg_path:
         return ffmpeg_path
@@ -29,152 +57,647 @@ def get_ffmpeg_path():
         "Linux: sudo apt install ffmpeg"
     )
 
-FFMPEG_PATH = get_ffmpeg_path()
+def __getattr__(name):
+    # Eski `subtitler.FFMPEG_PATH` murojaatlari uchun: yo'l import paytida emas, birinchi murojaatda aniqlanadi
+    if name == "FFMPEG_PATH":
+        return get_ffmpeg_path()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+_ffmpeg_checked = False
+
+def run_ffmpeg(cmd, timeout=None):
+    """FFmpeg ni ishga tushirish; vazifa bekor qilinsa jarayon darhol to'xtatiladi"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                returncode = process.wait(timeout=0.5)
+                break
+            except subprocess.TimeoutExpired:
+                check_cancelled()
+                if deadline is not None and time.monotonic() > deadline:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+@contextlib.contextmanager
+def cancellable(model):
+    """model.transcribe ichida har bir 30 soniyalik oyna dekodlanishidan oldin bekor qilishni tekshirish.
+    
+    Model ijarasi davomida boshqa oqim undan foydalanmaydi, shuning uchun
+    decode ni vaqtincha almashtirish xavfsiz.
+    """
+    decode = model.decode
+    
+    def checked_decode(*args, **kwargs):
+        check_cancelled()
+        return decode(*args, **kwargs)
+    
+    model.decode = checked_decode
+    try:
+        yield model
+    finally:
+        del model.decode
 
 def check_ffmpeg():
-    # FFmpeg mavjudligini tekshirish
+    # FFmpeg mavjudligini tekshirish (muvaffaqiyatli natija qayta tekshirilmaydi)
+    global _ffmpeg_checked
+    if _ffmpeg_checked:
+        return True
     try:
-        result = subprocess.run([FFMPEG_PATH, "-version"], 
+        result = subprocess.run([get_ffmpeg_path(), "-version"], 
                               capture_output=True, text=True, timeout=5)
-        return result.returncode == 0
+        _ffmpeg_checked = result.returncode == 0
+        return _ffmpeg_checked
     except:
         return False
 
 def extract_audio(video_path, audio_path):
     """Audio ajratish funksiyasi"""
     try:
-        subprocess.run([
-            FFMPEG_PATH, "-y", "-i", video_path, 
-            "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1", 
-            audio_path
-        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        with stage("extract_audio"):
+            subprocess.run([
+                get_ffmpeg_path(), "-y", "-i", video_path, 
+                "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1", 
+                audio_path
+            ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
         return True
     except subprocess.CalledProcessError as e:
-        print(f"Audio ajratishda xatolik: {e}")
+        logger.error("Audio ajratishda xatolik: %s", e)
         return False
     except Exception as e:
-        print(f"Xatolik: {e}")
+        logger.exception("Xatolik: %s", e)
+        return False
+
+# Whisper kutadigan audio formati: 16 kHz, mono
+SAMPLE_RATE = 16000
+
+# Quvurdan bir martada o'qiladigan baytlar (taxminan 4 soniya audio)
+_PCM_CHUNK_BYTES = 1 << 17
+
+class PcmStream:
+    """ffmpeg quvuridan 16 kHz mono PCM audioni bo'laklab o'qish"""
+    
+    def __init__(self, video_path):
+        cmd = [
+            get_ffmpeg_path(), "-nostdin", "-v", "error", "-i", video_path,
+            "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "-ac", "1",
+            "-"
+        ]
+        self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._pending = b""
+        self.finished = False
+    
+    def read_into(self, out):
+        """`out` float32 massivini to'ldirish; yozilgan namunalar sonini qaytaradi"""
+        filled = 0
+        while filled < len(out) and not self.finished:
+            want = 2 * (len(out) - filled) - len(self._pending)
+            chunk = self._process.stdout.read(max(2, min(_PCM_CHUNK_BYTES, want)))
+            if not chunk:
+                self.finished = True
+                break
+            data = self._pending + chunk
+            usable = len(data) - (len(data) % 2)
+            self._pending = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=np.int16)
+            np.multiply(samples, 1.0 / 32768.0, out=out[filled:filled + len(samples)], casting="unsafe")
+            filled += len(samples)
+        return filled
+    
+    def close(self):
+        process = self._process
+        try:
+            if self.finished:
+                stderr = process.stderr.read()
+                if process.wait() != 0:
+                    raise Exception(f"Audio ajratishda xatolik: {stderr.decode('utf-8', 'ignore').strip()}")
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            process.stderr.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
         return False
 
-def generate_subtitles(video_path, model_size="base", progress_callback=None):
+def load_audio(video_path, duration=None):
+    """Audioni ffmpeg quvuri orqali to'g'ridan-to'g'ri float32 NumPy massiviga o'qish.
+    
+    Vaqtinchalik WAV fayl yozilmaydi va Whisper audioni qayta dekodlamaydi.
+    """
+    # Davomiylik ma'lum bo'lsa, bufer oldindan ajratiladi
+    capacity = int(duration * SAMPLE_RATE) + SAMPLE_RATE if duration else 60 * SAMPLE_RATE
+    buffer = np.empty(capacity, dtype=np.float32)
+    filled = 0
+    
+    with stage("extract_audio", streamed=True), PcmStream(video_path) as stream:
+        while not stream.finished:
+            if filled == len(buffer):
+                buffer = np.resize(buffer, len(buffer) * 2)
+            filled += stream.read_into(buffer[filled:])
+    
+    # Ortiqcha joyni bo'shatish
+    if filled < len(buffer):
+        buffer = buffer[:filled].copy()
+    return buffer
+
+@functools.lru_cache(maxsize=None)
+def get_ffprobe_path():
+    # ffprobe odatda ffmpeg bilan bir katalogda bo'ladi
+    ffprobe_path = shutil.which("ffprobe")
+    if ffprobe_path:
+        return ffprobe_path
+    name = "ffprobe.exe" if os.name == 'nt' else "ffprobe"
+    return os.path.join(os.path.dirname(get_ffmpeg_path()), name)
+
+def get_media_info(video_path, content_hash=None, keyframes=False):
+    """Media ma'lumotlari (keshlangan); aniqlab bo'lmasa None.
+    
+    Kalit kadrlar butun faylni o'qishni talab qiladi - faqat `keyframes=True` da yig'iladi.
+    """
+    try:
+        return probe_media(video_path, content_hash, keyframes)
+    except Exception as e:
+        logger.warning("Media ma'lumotlarini aniqlab bo'lmadi (%s): %s", video_path, e)
+        return None
+
+def get_media_duration(video_path, content_hash=None):
+    """Media davomiyligi (soniya); aniqlab bo'lmasa None"""
+    info = get_media_info(video_path, content_hash)
+    return info.duration if info else None
+
+def transcription_options(mode, quantize=None, vad=None, batch_size=None):
+    """Natijalar keshi kalitiga kiradigan sozlamalar (kvantlash, VAD va dekoder natijaga ta'sir qiladi)"""
+    options = {"mode": mode}
+    quantize = resolve_quantize(quantize)
+    if quantize:
+        options["quantize"] = quantize
+    if resolve_vad(vad):
+        options["vad"] = True
+    if mode != "window" and resolve_batch_size(batch_size) > 1:
+        options["batched"] = True
+    return options
+
+def transcribe_segments(video_path, model_size="base", progress_callback=None, quantize=None, threads=None,
+                        vad=None, batch_size=None, model_callback=None):
+    """Videoni transkripsiya qilib, subtitllar (Cue) ro'yxatini qaytarish.
+    
+    `quantize="int8"` - CPU uchun kvantlangan model; `threads` - torch intra-op
+    oqimlari soni (jarayon bo'yicha umumiy sozlama); `vad` - modelga faqat
+    nutq qismlarini yuborish; `batch_size` - bir vaqtda dekodlanadigan
+    oynalar soni (None - sozlamadan). So'ralgan model yuklanmasa, kichikroq
+    model ishlatiladi - `model_callback` ga haqiqatda ishlatilgan model beriladi.
+    """
     if not check_ffmpeg():
         raise FileNotFoundError("FFmpeg topilmadi! Iltimos, FFmpeg ni o'rnating.")
     
-    audio_path = tempfile.mktemp(suffix=".wav")
-    
     if progress_callback:
         progress_callback(5)
     
-    # Audio ajratish
-    if not extract_audio(video_path, audio_path):
-        raise Exception("Audio ajratishda xatolik yuz berdi.")
+    # Audio ajratish (xotirada, vaqtinchalik faylsiz); keshlangan davomiylik bo'yicha
+    # bufer bir marta ajratiladi, uzun mediada qayta-qayta nusxalanmaydi
+    try:
+        audio = load_audio(video_path, get_media_duration(video_path))
+    except Exception as e:
+        raise Exception(f"Audio ajratishda xatolik yuz berdi: {str(e)}")
+    
+    # Sukunatni tashlab yuborish: model faqat nutq qismlarini ko'radi
+    timeline = None
+    if resolve_vad(vad):
+        with stage("vad", audio_s=round(len(audio) / SAMPLE_RATE, 1)):
+            regions = detect_speech(audio, SAMPLE_RATE)
+        if not regions:
+            logger.info("Nutq topilmadi: %s", video_path)
+            return []
+        if speech_ratio(regions, len(audio)) < MAX_SPEECH_RATIO:
+            audio, timeline = compact_speech(audio, regions, SAMPLE_RATE)
     
     if progress_callback:
         progress_callback(15)
     
-    # Modelni yuklash
+    if threads:
+        configure_torch_threads(threads)
+    
+    # Modelni yuklash (jarayon bo'yicha umumiy keshdan). Ijara darhol `with` ga
+    # beriladi: oraliqda istisno (masalan, bekor qilish) bo'lsa, model band qolib ketadi
     try:
-        model = whisper.load_model(model_size)
+        lease = lease_model(model_size, quantize)
     except Exception as e:
         # Agar katta model yuklanmasa, kichikroq modelni sinab ko'ramiz
         try:
             if model_size != "base":
-                model = whisper.load_model("base")
+                lease = lease_model("base", quantize)
             else:
-                model = whisper.load_model("tiny")
+                lease = lease_model("tiny", quantize)
         except:
             raise Exception(f"Whisper modelini yuklab bo'lmadi: {str(e)}")
     
-    if progress_callback:
-        progress_callback(20)
-    
     # Transkripsiya qilish
-    try:
-        result = model.transcribe(audio_path, fp16=False, verbose=False)
-        segments = result["segments"]
-    except Exception as e:
-        raise Exception(f"Transkripsiya qilishda xatolik: {str(e)}")
+    batch_size = resolve_batch_size(batch_size)
+    with lease as model:
+        if model_callback:
+            model_callback(lease.size)
+        if progress_callback:
+            progress_callback(20)
+        try:
+            with stage("transcribe", model=lease.size, audio_s=round(len(audio) / SAMPLE_RATE, 1),
+                       batch_size=batch_size):
+                if batch_size > 1:
+                    segments = transcribe_batched(model, audio, batch_size)
+                else:
+                    with cancellable(model):
+                        segments = model.transcribe(audio, fp16=False, verbose=False)["segments"]
+        except JobCancelled:
+            raise
+        except Exception as e:
+            raise Exception(f"Transkripsiya qilishda xatolik: {str(e)}")
     
-    # SRT faylini yaratish
-    srt_path = tempfile.mktemp(suffix=".srt")
+    # Siqilgan audio vaqtlarini asl video vaqtiga qaytarish
+    if timeline is not None:
+        for seg in segments:
+            seg["start"] = timeline.to_original(seg["start"])
+            seg["end"] = timeline.to_original(seg["end"])
+    
+    return list(cues.from_segments(segments))
+
+def write_srt(segments, srt_path, progress_callback=None, progress_start=20, progress_span=75):
+    """Subtitllarni SRT fayliga yozish (raqamlar 1 dan boshlanadi)"""
     total = len(segments)
     
+    def on_cue(i):
+        if progress_callback and total > 0:
+            progress_callback(progress_start + int(progress_span * i / total))
+    
     try:
-        with open(srt_path, "w", encoding="utf-8") as f:
-            for i, seg in enumerate(segments):
-                start = seg["start"]
-                end = seg["end"]
-                text = seg["text"].strip()
-                f.write(f"{i+1}\n")
-                f.write(f"{format_time(start)} --> {format_time(end)}\n")
-                f.write(f"{text}\n\n")
-                
-                if progress_callback and total > 0:
-                    p = 20 + int(75 * (i + 1) / total)
-                    progress_callback(p)
+        with stage("srt_write", cues=total):
+            cues.write_srt(segments, srt_path, on_cue)
     except Exception as e:
         raise Exception(f"SRT fayl yaratishda xatolik: {str(e)}")
     
-    # Audio faylni o'chirish
+    return srt_path
+
+def lookup_cached_subtitles(video_path, model_size, options=None, content_hash=None, out_dir=None):
+    """Natijalar keshidan SRT ni olish; (srt yo'li yoki None, kesh kaliti) qaytaradi.
+    
+    `out_dir` - natija fayllari yoziladigan katalog (None - tizimning vaqtinchalik katalogi);
+    quyidagi funksiyalarda ham shunday.
+    """
+    cache = get_result_cache()
+    if cache is None:
+        return None, None
+    if content_hash is None:
+        content_hash = file_sha256(video_path)
+    key = cache.make_key(content_hash, model_size, options)
+    return cache.fetch(key, tempfile.mktemp(suffix=".srt", dir=out_dir)), key
+
+def store_cached_subtitles(cache_key, srt_path):
+    """Tayyor SRT ni natijalar keshiga saqlash"""
+    cache = get_result_cache()
+    if cache is None or cache_key is None:
+        return
     try:
-        os.remove(audio_path)
-    except:
-        pass
+        cache.store(cache_key, srt_path)
+    except Exception as e:
+        logger.warning("Natijani keshga saqlashda xatolik: %s", e)
+
+def generate_subtitles(video_path, model_size="base", progress_callback=None, content_hash=None,
+                       quantize=None, threads=None, vad=None, batch_size=None, out_dir=None):
+    # Bir xil video va model uchun avval yaratilgan natija
+    options = transcription_options("plain", quantize, vad, batch_size)
+    srt_path, cache_key = lookup_cached_subtitles(video_path, model_size, options, content_hash, out_dir)
+    if srt_path:
+        if progress_callback:
+            progress_callback(100)
+        return srt_path
+    
+    used_models = []
+    segments = transcribe_segments(video_path, model_size, progress_callback, quantize, threads, vad, batch_size,
+                                   model_callback=used_models.append)
+    
+    # SRT faylini yaratish
+    srt_path = tempfile.mktemp(suffix=".srt", dir=out_dir)
+    write_srt(segments, srt_path, progress_callback)
+    # Kichikroq model natijasi so'ralgan model kaliti bilan keshlanmaydi
+    requested = model_key(model_size, resolve_quantize(quantize))
+    if all(used == requested for used in used_models):
+        store_cached_subtitles(cache_key, srt_path)
+    else:
+        logger.warning("%s o'rniga %s modeli ishlatildi - natija keshlanmadi", model_size, used_models)
     
     if progress_callback:
         progress_callback(100)
     
     return srt_path
 
-def format_time(seconds):
-    h = int(seconds // 3600)
-    m = int((seconds % 3600) // 60)
-    s = int(seconds % 60)
-    ms = int((seconds - int(seconds)) * 1000)
-    return f"{h:02}:{m:02}:{s:02},{ms:03}"
+# ================== UZLUKSIZ OYNA BILAN TRANSKRIPSIYA ==================
 
-def translate_subtitles(srt_path, dest_lang, progress_callback=None):
-    out_path = tempfile.mktemp(suffix=f"_{dest_lang}.srt")
+def transcribe_long_media(video_path, model_size="base", progress_callback=None, window_seconds=30, duration=None,
+                          quantize=None, threads=None, vad=None):
+    """Uzun mediani audio bir marta ajratilgan holda 30 soniyalik oynalar bilan transkripsiya qilish.
+    
+    Xotirada faqat bitta oyna saqlanadi, shuning uchun xotira sarfi fayl
+    uzunligiga bog'liq emas. Oyna oxirida kesilib qolgan segment keyingi
+    oynaga o'tkaziladi, vaqtlar esa butun fayl bo'yicha uzluksiz hisoblanadi.
+    VAD yoqilgan bo'lsa, nutqsiz oynalar modelga yuborilmaydi.
+    """
+    if not check_ffmpeg():
+        raise FileNotFoundError("FFmpeg topilmadi! Iltimos, FFmpeg ni o'rnating.")
+    
+    if duration is None:
+        duration = get_media_duration(video_path)
+    
+    window = int(window_seconds * SAMPLE_RATE)
+    # Oyna oxiriga shuncha yaqin tugagan segment to'liq emas deb hisoblanadi
+    tail = SAMPLE_RATE
+    buffer = np.zeros(window, dtype=np.float32)
+    filled = 0
+    window_start = 0.0
+    prompt = None
+    segments = []
+    use_vad = resolve_vad(vad)
     
+    if threads:
+        configure_torch_threads(threads)
+    # Ijara darhol `with` ga beriladi (transcribe_segments dagi kabi)
     try:
-        with open(srt_path, "r", encoding="utf-8") as fin:
-            lines = fin.readlines()
+        lease = lease_model(model_size, quantize)
     except Exception as e:
-        raise Exception(f"SRT faylni o'qishda xatolik: {str(e)}")
-    
-    blocks = []
-    block = []
+        raise Exception(f"Whisper modelini yuklab bo'lmadi: {str(e)}")
     
-    for line in lines:
-        if line.strip() == "":
-            if len(block) == 3:
-                blocks.append(block.copy())
-            block = []
-        else:
-            block.append(line)
+    with lease as model, PcmStream(video_path) as stream:
+        if progress_callback:
+            progress_callback(5)
+        while True:
+            check_cancelled()
+            filled += stream.read_into(buffer[filled:])
+            if filled == 0:
+                break
+            last_window = stream.finished
+            
+            if use_vad:
+                with stage("vad", audio_s=round(filled / SAMPLE_RATE, 1)):
+                    has_speech = bool(detect_speech(buffer[:filled], SAMPLE_RATE))
+            else:
+                has_speech = True
+            
+            if has_speech:
+                try:
+                    with stage("transcribe", model=lease.size, mode="window", audio_s=round(filled / SAMPLE_RATE, 1)), \
+                            cancellable(model):
+                        result = model.transcribe(
+                            buffer[:filled], fp16=False, verbose=False,
+                            condition_on_previous_text=False, initial_prompt=prompt
+                        )
+                except JobCancelled:
+                    raise
+                except Exception as e:
+                    raise Exception(f"Transkripsiya qilishda xatolik: {str(e)}")
+                window_segments = result["segments"]
+            else:
+                # Butun oyna sukunat: u to'liq o'tkazib yuboriladi
+                window_segments = []
+            
+            if not last_window:
+                complete = [seg for seg in window_segments if seg["end"] * SAMPLE_RATE <= filled - tail]
+                if complete:
+                    window_segments = complete
+            
+            if last_window or not window_segments:
+                consumed = filled
+            else:
+                consumed = min(filled, max(1, int(window_segments[-1]["end"] * SAMPLE_RATE)))
+            
+            for seg in window_segments:
+                text = seg["text"].strip()
+                if text:
+                    segments.append(cues.Cue.from_seconds(
+                        window_start + seg["start"],
+                        window_start + min(seg["end"], filled / SAMPLE_RATE),
+                        text
+                    ))
+            if segments:
+                prompt = segments[-1].text
+            
+            # Ishlatilmagan qoldiqni oyna boshiga surish
+            remaining = filled - consumed
+            if remaining:
+                buffer[:remaining] = buffer[consumed:filled]
+            filled = remaining
+            window_start += consumed / SAMPLE_RATE
+            
+            if progress_callback and duration:
+                progress_callback(min(95, 5 + int(90 * window_start / duration)))
+            
+            if last_window and filled == 0:
+                break
     
-    if len(block) == 3:
-        blocks.append(block.copy())
+    if progress_callback:
+        progress_callback(95)
     
-    total = len(blocks)
+    return segments
+
+# ================== PARALLEL TRANSKRIPSIYA ==================
+
+def available_memory_mb():
+    """Ishlatish mumkin bo'lgan operativ xotira (MB); aniqlab bo'lmasa None"""
+    # MemAvailable bo'shatilishi mumkin bo'lgan sahifa keshini ham hisobga oladi;
+    # katta fayl yozilgandan keyin MemFree juda kichik bo'lib qoladi
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+def default_worker_count(model_size, num_parts, quantize=None):
+    """Yadrolar soni va bo'sh xotiraga qarab jarayonlar sonini tanlash"""
+    cores = os.cpu_count() or 1
+    workers = min(cores, num_parts)
+    if settings.TRANSCRIBE_WORKERS > 0:
+        workers = min(workers, settings.TRANSCRIBE_WORKERS)
     
+    free_mb = available_memory_mb()
+    if free_mb is not None:
+        # Har bir jarayon modelning o'z nusxasini yuklaydi
+        workers = min(workers, int(free_mb // estimate_model_memory_mb(model_size, resolve_quantize(quantize))))
+    return max(1, workers)
+
+def _init_transcribe_worker(num_threads):
+    # Har bir jarayon yadrolarning o'z ulushidan foydalanadi
     try:
-        with open(out_path, "w", encoding="utf-8") as fout:
-            for i, block in enumerate(blocks):
-                fout.write(block[0])
-                fout.write(block[1])
-                
-                # Tarjima qilish
+        configure_torch_threads(num_threads)
+    except Exception:
+        pass
+
+def _transcribe_part(part_path, model_size, quantize=None, vad=None):
+    try:
+        return transcribe_segments(part_path, model_size, quantize=quantize, vad=vad), None
+    except Exception as e:
+        return None, str(e)
+
+def _normalize_text(text):
+    return " ".join(text.lower().split())
+
+def merge_part_segments(part_segments, offsets, overlap_tolerance_ms=100, merge_gap_ms=1000):
+    """Qismlar subtitllarini vaqt siljishi bilan birlashtirish va chegaradagi takrorlarni olib tashlash.
+    
+    `offsets` - har bir qismning boshlanish vaqti (soniya).
+    """
+    merged = []
+    for segments, offset in zip(part_segments, offsets):
+        if not segments:
+            continue
+        offset_ms = round(offset * 1000)
+        for cue in segments:
+            text = cue.text.strip()
+            if not text:
+                continue
+            start = cue.start + offset_ms
+            end = cue.end + offset_ms
+            
+            if merged:
+                last = merged[-1]
+                # Oldingi qism allaqachon qamrab olgan subtitl
+                if end <= last.end + overlap_tolerance_ms:
+                    continue
+                # Chegarada ikki marta tanilgan bir xil matn
+                if _normalize_text(text) == _normalize_text(last.text) and start <= last.end + merge_gap_ms:
+                    last.end = max(last.end, end)
+                    continue
+                # Ustma-ust tushishni kesib tashlash
+                if start < last.end:
+                    start = last.end
+            
+            merged.append(cues.Cue(start, end, text))
+    return merged
+
+def transcribe_parts_parallel(part_paths, offsets, model_size="base", max_workers=None, progress_callback=None,
+                              quantize=None, vad=None):
+    """Video qismlarini jarayonlar havzasida parallel transkripsiya qilish.
+    
+    (segmentlar, xatoliklar) qaytaradi; xatoliklar - (qism indeksi, xabar) ro'yxati.
+    """
+    # Ishchi jarayonlar sozlamani qayta o'qimasligi uchun aniq qiymat uzatiladi
+    quantize = resolve_quantize(quantize) or "none"
+    vad = resolve_vad(vad)
+    if max_workers is None:
+        max_workers = default_worker_count(model_size, len(part_paths), quantize)
+    threads = max(1, (os.cpu_count() or 1) // max_workers)
+    
+    results = [None] * len(part_paths)
+    errors = []
+    done = 0
+    
+    # "spawn" - Streamlit oqimlari va torch bilan xavfsiz
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context,
+                             initializer=_init_transcribe_worker, initargs=(threads,)) as pool:
+        futures = {pool.submit(_transcribe_part, path, model_size, quantize, vad): i for i, path in enumerate(part_paths)}
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
                 try:
-                    translated = GoogleTranslator(source='auto', target=dest_lang).translate(block[2].strip())
-                    fout.write(translated + "\n\n")
+                    segments, error = future.result()
                 except Exception as e:
-                    # Agar tarjima qilishda xatolik bo'lsa, original matnni qoldiramiz
-                    fout.write(block[2] + "\n\n")
-                
+                    segments, error = None, str(e)
+                if error:
+                    errors.append((i, error))
+                results[i] = segments
+                done += 1
                 if progress_callback:
-                    p = int(100 * (i + 1) / total)
-                    progress_callback(p)
+                    progress_callback(int(95 * done / len(part_paths)))
+        except BaseException:
+            # Masalan, vazifa bekor qilinganda navbatdagi qismlar boshlanmaydi
+            for future in futures:
+                future.cancel()
+            raise
+    
+    return merge_part_segments(results, offsets), sorted(errors)
+
+def format_time(seconds):
+    return cues.format_timestamp(round(seconds * 1000))
+
+def load_translation_state(state_path, dest_lang):
+    """Avvalgi tarjimaning {asl matn: tarjima} xaritasi; fayl yo'q yoki boshqa til bo'lsa bo'sh"""
+    if not state_path:
+        return {}
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if state.get("lang") != dest_lang:
+        return {}
+    return state.get("pairs", {})
+
+def save_translation_state(state_path, dest_lang, pairs):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"lang": dest_lang, "pairs": pairs}, f, ensure_ascii=False)
+    os.replace(tmp_path, state_path)
+
+def translate_subtitles(srt_path, dest_lang, progress_callback=None, engine=None, state_path=None, out_dir=None):
+    """SRT ni tarjima qilish; yangi SRT yo'lini qaytaradi.
+    
+    `state_path` berilsa, unda avvalgi ishga tushirishning asl matn -> tarjima
+    xaritasi saqlanadi. Qayta ishga tushirishda faqat qo'shilgan yoki matni
+    o'zgargan subtitllar tarjimonga yuboriladi; faqat vaqti o'zgarganlari
+    avvalgi tarjima bilan qoladi.
+    """
+    try:
+        source_cues = cues.read_srt(srt_path)
+    except Exception as e:
+        raise Exception(f"SRT faylni o'qishda xatolik: {str(e)}")
+    return translate_cues(source_cues, dest_lang, progress_callback, engine, state_path, out_dir)
+
+def translate_cues(source_cues, dest_lang, progress_callback=None, engine=None, state_path=None, out_dir=None):
+    """O'qilgan subtitllarni tarjima qilib, yangi SRT yo'lini qaytarish"""
+    out_path = tempfile.mktemp(suffix=f"_{dest_lang}.srt", dir=out_dir)
+    
+    # Tarjima qilish: subtitllar guruhlanib, parallel so'rovlar bilan yuboriladi.
+    # Xatolik bo'lgan subtitllar uchun original matn qoladi
+    if engine is None:
+        engine = get_default_engine()
+    texts = [cue.text.strip() for cue in source_cues]
+    previous = load_translation_state(state_path, dest_lang)
+    changed = [t for t in texts if t not in previous]
+    known = {t: previous[t] for t in texts if t in previous}
+    if state_path:
+        logger.info("Tarjima: %d ta subtitl avvalgidan olindi, %d tasi yuboriladi",
+                    len(texts) - len(changed), len(changed))
+    
+    fresh = engine.translate_map(changed, dest_lang, progress_callback) if changed else {}
+    known.update(fresh)
+    translations = [known.get(t, t) for t in texts]
+    
+    if state_path:
+        # Faqat joriy matnlar saqlanadi - o'chirilgan subtitllar xaritadan chiqadi
+        try:
+            save_translation_state(state_path, dest_lang, known)
+        except Exception as e:
+            logger.warning("Tarjima holatini saqlashda xatolik: %s", e)
+    
+    try:
+        cues.write_srt(
+            (cues.Cue(cue.start, cue.end, translated) for cue, translated in zip(source_cues, translations)),
+            out_path
+        )
     except Exception as e:
         raise Exception(f"Tarjima faylini yozishda xatolik: {str(e)}")
     
@@ -183,24 +706,385 @@ def translate_subtitles(srt_path, dest_lang, progress_callback=None):
     
     return out_path
 
-def burn_subtitles(video_path, srt_path):
-    out_path = tempfile.mktemp(suffix=".mp4")
+def translate_subtitles_multi(srt_path, dest_langs, progress_callback=None, engine=None, state_paths=None,
+                              out_dir=None):
+    """SRT ni bir o'qishda bir nechta tilga parallel tarjima qilish; {til: SRT yo'li} qaytaradi.
+    
+    Tillar alohida oqimlarda tarjima qilinadi, lekin umumiy tarjimon
+    mexanizmidan foydalanadi: so'rovlar cheklovi barcha tillar uchun bitta.
+    Biror til xato bilan tugasa, qolganlari baribir yakunlanadi.
+    """
+    try:
+        source_cues = cues.read_srt(srt_path)
+    except Exception as e:
+        raise Exception(f"SRT faylni o'qishda xatolik: {str(e)}")
+    if engine is None:
+        engine = get_default_engine()
+    state_paths = state_paths or {}
+    dest_langs = list(dict.fromkeys(dest_langs))
+    
+    progress = dict.fromkeys(dest_langs, 0)
+    
+    def on_progress(lang, value):
+        progress[lang] = value
+        if progress_callback:
+            progress_callback(int(sum(progress.values()) / len(progress)))
+    
+    results = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, len(dest_langs))) as pool:
+        # Tarjima bosqichlari chaqiruvchi vazifaning trace iga yozilishi uchun kontekst nusxalanadi
+        futures = {
+            pool.submit(contextvars.copy_context().run, translate_cues, source_cues, lang,
+                        functools.partial(on_progress, lang), engine, state_paths.get(lang), out_dir): lang
+            for lang in dest_langs
+        }
+        for future in as_completed(futures):
+            lang = futures[future]
+            try:
+                results[lang] = future.result()
+            except Exception as e:
+                logger.error("Tarjima xatosi (%s): %s", lang, e)
+                errors.append(f"{lang}: {e}")
+    
+    if not results:
+        raise Exception(f"Hech bir tilga tarjima qilib bo'lmadi: {'; '.join(errors)}")
+    return {lang: results[lang] for lang in dest_langs if lang in results}
+
+# Qayta kodlashsiz MP4 ga nusxalanadigan kodeklar; boshqalari uchun darhol MKV tanlanadi
+MP4_CODECS = {"h264", "hevc", "mpeg4", "av1", "vp9", "aac", "mp3", "ac3", "eac3", "alac", "opus", "flac"}
+
+def soft_container(video_path, content_hash=None):
+    """Yumshoq subtitl uchun konteyner: barcha oqimlar MP4 ga mos bo'lsa "mp4", aks holda MKV"""
+    info = get_media_info(video_path, content_hash)
+    if info is None:
+        return "mp4"
+    codecs = {stream["codec"] for stream in info.streams if stream["type"] in ("video", "audio")}
+    return "mp4" if codecs <= MP4_CODECS else "mkv"
+
+# Subtitl treklari uchun ISO 639-2 (B) til kodlari: MP4 va MKV shu kodlarni kutadi
+ISO639_2 = {
+    "en": "eng", "ru": "rus", "uz": "uzb", "tr": "tur", "de": "ger", "fr": "fre",
+    "es": "spa", "ar": "ara", "zh": "chi", "ja": "jpn", "ko": "kor", "hi": "hin",
+}
+
+def language_tag(lang):
+    """Tarjima tili kodini ("zh-CN" kabi) trek til tegiga aylantirish; noma'lum bo'lsa und"""
+    if not lang:
+        return "und"
+    return ISO639_2.get(lang.split("-")[0].lower(), "und")
+
+def mux_subtitle_tracks(video_path, tracks, container="mp4", out_dir=None):
+    """Bir nechta SRT ni til teglari bilan alohida yumshoq treklar qilib qo'shish.
+    
+    `tracks` - [(srt yo'li, til kodi, nomi)]; birinchi trek standart bo'ladi.
+    Video va audio bitta o'tishda qayta kodlashsiz nusxalanadi.
+    """
+    out_path = tempfile.mktemp(suffix=f".{container}", dir=out_dir)
+    # MP4/MOV faqat mov_text subtitllarini qo'llaydi
+    subtitle_codec = "srt" if container == "mkv" else "mov_text"
+    cmd = [get_ffmpeg_path(), "-y", "-i", video_path]
+    for srt_path, _, _ in tracks:
+        cmd += ["-i", srt_path]
+    cmd += ["-map", "0:v?", "-map", "0:a?"]
+    for i in range(len(tracks)):
+        cmd += ["-map", f"{i + 1}:0"]
+    cmd += ["-c:v", "copy", "-c:a", "copy", "-c:s", subtitle_codec]
+    for i, (_, lang, title) in enumerate(tracks):
+        if lang:
+            cmd += [f"-metadata:s:s:{i}", f"language={language_tag(lang)}"]
+        if title:
+            cmd += [f"-metadata:s:s:{i}", f"title={title}"]
+        cmd += [f"-disposition:s:{i}", "default" if i == 0 else "0"]
+    cmd.append(out_path)
+    run_ffmpeg(cmd)
+    return out_path
+
+def mux_with_fallback(video_path, tracks, content_hash=None, out_dir=None):
+    """Yumshoq treklarni mos konteynerga qo'shish; xatolik bo'lsa None.
     
+    Kodeklar MP4 ga mos bo'lsa, avval MP4 sinab ko'riladi: ba'zi oqimlarni
+    baribir nusxalab bo'lmaydi - MKV esa barchasini qabul qiladi.
+    """
+    containers = ("mp4", "mkv") if soft_container(video_path, content_hash) == "mp4" else ("mkv",)
+    for container in containers:
+        try:
+            return mux_subtitle_tracks(video_path, tracks, container, out_dir)
+        except subprocess.CalledProcessError as e:
+            logger.warning("FFmpeg xatosi (%s): %s", container, e)
+        except JobCancelled:
+            raise
+        except Exception as e:
+            logger.exception("Subtitl treklarini qo'shishda xatolik: %s", e)
+            return None
+    return None
+
+def burn_subtitle_tracks(video_path, tracks, out_dir=None, content_hash=None):
+    """Barcha tillarni bitta videoga yumshoq treklar sifatida qo'shish; xatolik bo'lsa None"""
+    with stage("burn", mode="multitrack", tracks=len(tracks)):
+        return mux_with_fallback(video_path, tracks, content_hash, out_dir)
+
+# Qattiq biriktirish (qayta kodlash) uchun tezlik profillari
+BURN_PROFILES = {
+    "fast": {"preset": "veryfast", "crf": 23, "max_height": None},
+    "balanced": {"preset": "medium", "crf": 23, "max_height": None},
+    "quality": {"preset": "slow", "crf": 20, "max_height": None},
+    "preview": {"preset": "ultrafast", "crf": 28, "max_height": 720},
+}
+
+def subtitles_filter(srt_path):
     # SRT fayl yo'lini to'g'rilash (bo'shliqlar bo'lsa)
     srt_path_escaped = f"'{srt_path}'" if ' ' in srt_path else srt_path
+    return f"subtitles={srt_path_escaped}"
+
+def encode_args(profile="balanced", threads=None, max_height=None):
+    """Profil bo'yicha video filtr qismi va libx264 kodlash parametrlari"""
+    options = BURN_PROFILES.get(profile, BURN_PROFILES["balanced"])
+    if threads is None:
+        threads = settings.BURN_THREADS
+    if max_height is None:
+        max_height = options["max_height"]
+    
+    # Avval kichraytirish, keyin subtitl chizish: yozuvlar yakuniy o'lchamda chiziladi
+    scale = f"scale=-2:'min({max_height},ih)'" if max_height else None
+    args = ["-c:v", "libx264", "-preset", options["preset"], "-crf", str(options["crf"])]
+    if threads:
+        args += ["-threads", str(threads)]
+    return scale, args
+
+def burn_subtitles(video_path, srt_path, mode="hard", profile="balanced", threads=None, max_height=None,
+                   content_hash=None, out_dir=None):
+    """Subtitlni videoga biriktirish.
+    
+    mode="soft" - audio va video nusxalanadi, subtitl alohida trek bo'ladi;
+    mode="hard" - subtitl kadrlarga yoziladi, `profile` kodlash tezligini belgilaydi;
+    mode="segmented" - qattiq biriktirish bo'laklarda parallel;
+    mode="incremental" - avvalgi biriktirishdan keyin faqat o'zgargan bo'laklar qayta kodlanadi.
+    """
+    with stage("burn", mode=mode, profile=profile):
+        return _burn_subtitles(video_path, srt_path, mode, profile, threads, max_height, content_hash, out_dir)
+
+def _burn_subtitles(video_path, srt_path, mode, profile, threads, max_height, content_hash, out_dir):
+    if mode == "segmented":
+        return burn_subtitles_segmented(video_path, srt_path, profile=profile, max_height=max_height,
+                                        content_hash=content_hash, threads=threads, out_dir=out_dir)
+    
+    if mode == "incremental":
+        return burn_subtitles_incremental(video_path, srt_path, content_hash, profile=profile, max_height=max_height,
+                                          threads=threads, out_dir=out_dir)
+    
+    if mode == "soft":
+        return mux_with_fallback(video_path, [(srt_path, None, None)], content_hash, out_dir)
+    
+    out_path = tempfile.mktemp(suffix=".mp4", dir=out_dir)
+    
+    scale, codec_args = encode_args(profile, threads, max_height)
+    video_filter = ",".join(f for f in (scale, subtitles_filter(srt_path)) if f)
     
     cmd = [
-        FFMPEG_PATH, "-y", "-i", video_path, 
-        "-vf", f"subtitles={srt_path_escaped}", 
+        get_ffmpeg_path(), "-y", "-i", video_path, 
+        "-vf", video_filter, 
+        *codec_args,
         "-c:a", "copy", out_path
     ]
     
     try:
-        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        run_ffmpeg(cmd)
+        return out_path
+    except subprocess.CalledProcessError as e:
+        logger.error("FFmpeg xatosi: %s", e)
+        return None
+    except JobCancelled:
+        raise
+    except Exception as e:
+        logger.exception("Subtitl biriktirishda xatolik: %s", e)
+        return None
+
+# ================== BO'LAKLAB PARALLEL BIRIKTIRISH ==================
+
+def choose_split_points(keyframes, duration, num_segments):
+    """Teng bo'laklarga eng yaqin kalit kadrlarni tanlash (GOP chegarasida bo'lish)"""
+    points = [0.0]
+    for i in range(1, num_segments):
+        target = duration * i / num_segments
+        candidates = [k for k in keyframes if k > points[-1]]
+        if not candidates:
+            break
+        nearest = min(candidates, key=lambda k: abs(k - target))
+        if nearest < duration:
+            points.append(nearest)
+    points.append(duration)
+    return points
+
+def _burn_segment(video_path, srt_path, start, length, out_path, profile, threads, max_height):
+    check_cancelled()
+    scale, codec_args = encode_args(profile, threads, max_height)
+    video_filter = ",".join(f for f in (scale, subtitles_filter(srt_path)) if f)
+    cmd = [
+        get_ffmpeg_path(), "-y", "-ss", f"{start:.6f}", "-i", video_path, "-t", f"{length:.6f}",
+        "-map", "0:v:0", "-vf", video_filter, *codec_args, "-an", out_path
+    ]
+    with stage("burn_segment", start_s=round(start, 3), length_s=round(length, 3)):
+        run_ffmpeg(cmd)
+    return out_path
+
+def concat_segments(segment_paths, audio_source, out_path, work_dir):
+    """Bo'laklarni concat demuxer bilan qayta kodlashsiz birlashtirish va asl audioni qo'shish"""
+    list_path = os.path.join(work_dir, "segments.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [
+        get_ffmpeg_path(), "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+        "-i", audio_source, "-map", "0:v:0", "-map", "1:a?",
+        "-c", "copy", "-movflags", "+faststart", out_path
+    ]
+    with stage("concat", segments=len(segment_paths)):
+        run_ffmpeg(cmd)
+    return out_path
+
+def plan_split_points(video_path, num_segments=None, segment_seconds=None, content_hash=None):
+    """Kalit kadrlarga to'g'rilangan bo'lish nuqtalari (soniya); bo'lib bo'lmasa bo'sh ro'yxat.
+    
+    Bo'laklar soni `num_segments` yoki har biri taxminan `segment_seconds`
+    uzunlikda bo'ladigan qilib tanlanadi.
+    """
+    info = get_media_info(video_path, content_hash, keyframes=True)
+    if info is None:
+        return []
+    duration, keyframes = info.duration, info.keyframes
+    if not duration or not keyframes:
+        return []
+    if num_segments is None:
+        num_segments = max(1, math.ceil(duration / segment_seconds))
+    return choose_split_points(keyframes, duration, num_segments)
+
+def burn_ranges(video_path, ranges, profile="balanced", max_height=None, threads=None):
+    """(srt, boshlanish, uzunlik, chiqish yo'li) bo'laklarini parallel kodlash.
+    
+    `threads` - barcha bo'laklar uchun jami oqimlar soni (None - sozlama yoki yadrolar soni).
+    """
+    if not ranges:
+        return []
+    total = threads or settings.BURN_THREADS or (os.cpu_count() or 1)
+    workers = min(total, len(ranges))
+    threads = max(1, total // workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Bo'lak bosqichlari joriy vazifa trace iga yozilishi uchun kontekst nusxalanadi
+        futures = [
+            pool.submit(contextvars.copy_context().run, _burn_segment, video_path, srt, start, length,
+                        out, profile, threads, max_height)
+            for srt, start, length, out in ranges
+        ]
+        return [future.result() for future in futures]
+
+def burn_subtitles_segmented(video_path, srt_path, num_segments=None, profile="balanced", max_height=None,
+                             content_hash=None, threads=None, out_dir=None):
+    """Videoni kalit kadrlar bo'yicha bo'laklarga ajratib, har birini parallel kodlash.
+    
+    Har bir bo'lakka faqat o'z vaqt oralig'idagi subtitllar (siljitilgan holda)
+    yoziladi. Bo'laklar qayta kodlashsiz birlashtiriladi, audio esa asl
+    videodan nusxalanadi, shuning uchun natija kadrma-kadr aniq bo'ladi.
+    """
+    if num_segments is None:
+        num_segments = settings.BURN_SEGMENTS or (os.cpu_count() or 1)
+    
+    points = plan_split_points(video_path, num_segments, content_hash=content_hash)
+    if len(points) < 3:
+        # Bo'lishning foydasi yo'q - oddiy qattiq biriktirish (chaqiruvchining "burn" bosqichi ichida)
+        return _burn_subtitles(video_path, srt_path, "hard", profile, threads, max_height, content_hash, out_dir)
+    
+    source_cues = cues.read_srt(srt_path)
+    work_dir = tempfile.mkdtemp(prefix="burn_", dir=out_dir)
+    out_path = tempfile.mktemp(suffix=".mp4", dir=out_dir)
+    
+    try:
+        ranges = []
+        for i, (start, end) in enumerate(zip(points[:-1], points[1:])):
+            check_cancelled()
+            segment_srt = os.path.join(work_dir, f"segment_{i:04d}.srt")
+            cues.write_srt(cues.clip_cues(source_cues, round(start * 1000), round(end * 1000)), segment_srt)
+            ranges.append((segment_srt, start, end - start, os.path.join(work_dir, f"segment_{i:04d}.mp4")))
+        segment_paths = burn_ranges(video_path, ranges, profile, max_height, threads)
+        
+        return concat_segments(segment_paths, video_path, out_path, work_dir)
+    except subprocess.CalledProcessError as e:
+        logger.error("FFmpeg xatosi: %s", e)
+        return None
+    except JobCancelled:
+        raise
+    except Exception as e:
+        logger.exception("Subtitl biriktirishda xatolik: %s", e)
+        return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def burn_subtitles_incremental(video_path, srt_path, content_hash=None, profile="balanced", max_height=None,
+                               segment_seconds=None, threads=None, out_dir=None):
+    """Tahrirdan keyin qayta biriktirish: faqat subtitllari o'zgargan bo'laklar qayta kodlanadi.
+    
+    Video kalit kadrlar bo'yicha qisqa bo'laklarga bo'linadi va har bir
+    kodlangan bo'lak o'z subtitllari xeshi bilan keshda saqlanadi. Keyingi
+    biriktirishda o'zgarmagan bo'laklar keshdan olinib, qayta kodlashsiz
+    birlashtiriladi. Birinchi marta esa bu oddiy bo'laklab biriktirishdir.
+    """
+    cache = get_segment_cache()
+    if cache is None:
+        return burn_subtitles_segmented(video_path, srt_path, profile=profile, max_height=max_height,
+                                        content_hash=content_hash, threads=threads, out_dir=out_dir)
+    if content_hash is None:
+        content_hash = file_sha256(video_path)
+    if segment_seconds is None:
+        segment_seconds = settings.INCREMENTAL_SEGMENT_SECONDS
+    
+    options = {"profile": profile, "max_height": max_height, "segment_seconds": segment_seconds}
+    key = cache.make_key(content_hash, options)
+    source_cues = cues.read_srt(srt_path)
+    work_dir = tempfile.mkdtemp(prefix="reburn_", dir=out_dir)
+    out_path = tempfile.mktemp(suffix=".mp4", dir=out_dir)
+    
+    try:
+        with cache.entry_lock(key):
+            manifest = cache.load_manifest(key) or {}
+            # Bo'lish nuqtalari bir marta aniqlanadi: bo'laklar chegarasi o'zgarmasligi shart
+            points = manifest.get("points") or plan_split_points(video_path, segment_seconds=segment_seconds,
+                                                                 content_hash=content_hash)
+            if len(points) < 3:
+                return _burn_subtitles(video_path, srt_path, "hard", profile, threads, max_height, content_hash,
+                                       out_dir)
+            
+            entry_dir = cache.entry_dir(key)
+            names = []
+            pending = []
+            for i, (start, end) in enumerate(zip(points[:-1], points[1:])):
+                segment_text = cues.to_srt_text(cues.clip_cues(source_cues, round(start * 1000), round(end * 1000)))
+                digest = hashlib.sha256(segment_text.encode("utf-8")).hexdigest()[:16]
+                name = f"segment_{i:05d}_{digest}.mp4"
+                names.append(name)
+                if os.path.exists(os.path.join(entry_dir, name)):
+                    continue
+                segment_srt = os.path.join(work_dir, f"segment_{i:05d}.srt")
+                with open(segment_srt, "w", encoding="utf-8") as f:
+                    f.write(segment_text)
+                # To'liq kodlanmagan bo'lak hech qachon tayyor nom bilan ko'rinmaydi
+                pending.append((segment_srt, start, end - start, os.path.join(entry_dir, f"{name}.part.mp4")))
+            
+            logger.info("Qayta biriktirish: %d/%d bo'lak kodlanadi", len(pending), len(names))
+            for part_path in burn_ranges(video_path, pending, profile, max_height, threads):
+                os.replace(part_path, part_path[:-len(".part.mp4")])
+            
+            concat_segments([os.path.join(entry_dir, name) for name in names], video_path, out_path, work_dir)
+            cache.save_manifest(key, {"points": points, "segments": names, "options": options})
+        cache.evict()
         return out_path
     except subprocess.CalledProcessError as e:
-        print(f"FFmpeg xatosi: {e}")
+        logger.error("FFmpeg xatosi: %s", e)
         return None
+    except JobCancelled:
+        raise
     except Exception as e:
-        print(f"Subtitl biriktirishda xatolik: {e}")
+        logger.exception("Subtitl biriktirishda xatolik: %s", e)
         return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
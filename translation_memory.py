@@ -0,0 +1,140 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+# Bitta SQL so'rovdagi parametrlar soni (SQLite cheklovidan past)
+_CHUNK = 500
+
+# Har shuncha yangi yozuvdan keyin eskilarini tozalash
+_EVICT_EVERY = 1000
+
+
+class TranslationMemory:
+    """(Matn, til) bo'yicha tarjimalarni diskda saqlovchi SQLite kesh"""
+
+    def __init__(self, path, max_entries=None, max_age_days=None):
+        self.path = path
+        self.max_entries = max_entries or settings.TRANSLATION_MEMORY_MAX_ENTRIES
+        self.max_age_days = max_age_days or settings.TRANSLATION_MEMORY_MAX_AGE_DAYS
+        self.hits = 0
+        self.misses = 0
+        self._inserted = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tm ("
+            " source TEXT NOT NULL,"
+            " lang TEXT NOT NULL,"
+            " translated TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (source, lang)"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tm_last_used ON tm (last_used)")
+        self._conn.commit()
+        self.evict()
+
+    def get_many(self, texts, lang):
+        """Keshdagi tarjimalarni {matn: tarjima} ko'rinishida qaytarish"""
+        unique = list(dict.fromkeys(texts))
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(unique), _CHUNK):
+                chunk = unique[start:start + _CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT source, translated FROM tm WHERE lang = ? AND source IN ({placeholders})",
+                    [lang, *chunk],
+                ).fetchall()
+                found.update(rows)
+            if found:
+                self._conn.executemany(
+                    "UPDATE tm SET last_used = ? WHERE source = ? AND lang = ?",
+                    [(now, source, lang) for source in found],
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, pairs, lang):
+        """(matn, tarjima) juftliklarini saqlash"""
+        now = time.time()
+        rows = [(source, lang, translated, now, now) for source, translated in pairs]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO tm (source, lang, translated, created, last_used)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+            self._inserted += len(rows)
+            need_evict = self._inserted >= _EVICT_EVERY
+            if need_evict:
+                self._inserted = 0
+        if need_evict:
+            self.evict()
+
+    def evict(self):
+        """Muddati o'tgan va eng kam ishlatilgan yozuvlarni o'chirish"""
+        with self._lock:
+            cutoff = time.time() - self.max_age_days * 86400
+            self._conn.execute("DELETE FROM tm WHERE last_used < ?", (cutoff,))
+            count = self._conn.execute("SELECT COUNT(*) FROM tm").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM tm WHERE (source, lang) IN ("
+                    " SELECT source, lang FROM tm ORDER BY last_used LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM tm").fetchone()[0]
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def get_translation_memory():
+    """Umumiy tarjima xotirasi (o'chirilgan bo'lsa None)"""
+    global _memory
+    if not settings.TRANSLATION_MEMORY_ENABLED:
+        return None
+    with _memory_lock:
+        if _memory is None:
+            try:
+                _memory = TranslationMemory(os.path.join(settings.CACHE_DIR, "translation_memory.sqlite3"))
+            except Exception as e:
+                logger.warning("Tarjima xotirasini ochib bo'lmadi: %s", e)
+                return None
+        return _memory
@@ -0,0 +1,240 @@
+import contextvars
+import json
+import logging
+import random
+import re
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import settings
+from instrumentation import stage
+from translation_memory import get_translation_memory
+
+logger = logging.getLogger(__name__)
+
+# Bir nechta subtitlni bitta so'rovga jamlashda ishlatiladigan ajratkich.
+# Tarjimon uni o'zgartirmasligi uchun alohida qatorga qo'yiladi
+DELIMITER = "\n|||\n"
+_SPLIT_RE = re.compile(r"\s*\|\s*\|\s*\|\s*")
+
+
+class TranslationBackend:
+    """Tarjima xizmati uchun umumiy interfeys"""
+
+    # Bitta so'rovdagi maksimal belgilar soni
+    max_chars = 4500
+
+    def translate(self, text, dest_lang, source_lang="auto"):
+        raise NotImplementedError
+
+
+class GoogleBackend(TranslationBackend):
+    """deep_translator orqali Google Translate"""
+
+    max_chars = 4500
+
+    def __init__(self):
+        # Har bir oqim o'z GoogleTranslator obyektlarini qayta ishlatadi
+        self._local = threading.local()
+
+    def translate(self, text, dest_lang, source_lang="auto"):
+        cache = getattr(self._local, "translators", None)
+        if cache is None:
+            cache = self._local.translators = {}
+        key = (source_lang, dest_lang)
+        translator = cache.get(key)
+        if translator is None:
+            # Kutubxona faqat birinchi so'rovda yuklanadi
+            from deep_translator import GoogleTranslator
+            translator = cache[key] = GoogleTranslator(source=source_lang, target=dest_lang)
+        return translator.translate(text)
+
+
+class HttpBackend(TranslationBackend):
+    """LibreTranslate API bilan mos HTTP xizmat (masalan, mahalliy stub server)"""
+
+    def __init__(self, url, api_key=None, timeout=30, max_chars=4500):
+        self.url = url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_chars = max_chars
+
+    def translate(self, text, dest_lang, source_lang="auto"):
+        payload = {"q": text, "source": source_lang, "target": dest_lang, "format": "text"}
+        if self.api_key:
+            payload["api_key"] = self.api_key
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            data = json.loads(response.read().decode("utf-8"))
+        return data["translatedText"]
+
+
+class RateLimiter:
+    """Oddiy token-bucket: soniyasiga `rate` ta so'rovdan oshirmaslik"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate or self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def make_batches(texts, max_chars):
+    """Matnlar indekslarini belgilar soni cheklangan guruhlarga ajratish"""
+    batches = []
+    current = []
+    current_len = 0
+    for i, text in enumerate(texts):
+        # Ajratkich bor matnlar alohida yuboriladi
+        if _SPLIT_RE.search(text):
+            batches.append([i])
+            continue
+        added = len(text) + (len(DELIMITER) if current else 0)
+        if current and current_len + added > max_chars:
+            batches.append(current)
+            current = []
+            current_len = 0
+            added = len(text)
+        current.append(i)
+        current_len += added
+    if current:
+        batches.append(current)
+    return batches
+
+
+def split_batch(translated, expected):
+    """Tarjima qilingan guruhni qayta bo'laklarga ajratish; mos kelmasa None.
+
+    Bo'sh qolgan bo'lak tarjima qilinmagan (None) hisoblanadi - bo'sh subtitl
+    yozilmaydi va xotiraga saqlanmaydi.
+    """
+    parts = _SPLIT_RE.split(translated.strip())
+    if len(parts) != expected:
+        return None
+    return [p.strip() or None for p in parts]
+
+
+class TranslationEngine:
+    """Subtitllarni guruhlab, parallel tarjima qiluvchi mexanizm"""
+
+    def __init__(self, backend=None, max_workers=None, rate_per_sec=None,
+                 max_retries=3, backoff=1.0, max_batch_chars=None, memory=None):
+        self.backend = backend or default_backend()
+        self.memory = memory
+        self.max_workers = max_workers or settings.TRANSLATE_WORKERS
+        self.limiter = RateLimiter(settings.TRANSLATE_RATE if rate_per_sec is None else rate_per_sec)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_batch_chars = max_batch_chars or self.backend.max_chars
+
+    def translate_map(self, texts, dest_lang, progress_callback=None):
+        """{matn: tarjima} lug'ati; tarjima qilinmagan matnlar lug'atga kirmaydi"""
+        # Fayl ichidagi bir xil matnlar faqat bir marta tarjima qilinadi
+        unique = list(dict.fromkeys(t for t in texts if t.strip()))
+        translated = {}
+        if unique and self.memory is not None:
+            translated.update(self.memory.get_many(unique, dest_lang))
+        pending = [t for t in unique if t not in translated]
+
+        if pending:
+            fresh = {}
+            batches = make_batches(pending, self.max_batch_chars)
+            done = 0
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                # Har bir guruh bosqichi chaqiruvchi vazifaning trace iga yoziladi
+                futures = {
+                    pool.submit(contextvars.copy_context().run, self._traced_batch,
+                                [pending[i] for i in batch], dest_lang): batch
+                    for batch in batches
+                }
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    for i, result in zip(batch, future.result()):
+                        if result is not None:
+                            fresh[pending[i]] = result
+                    done += len(batch)
+                    if progress_callback:
+                        progress_callback(int(100 * done / len(pending)))
+            if fresh and self.memory is not None:
+                self.memory.put_many(fresh.items(), dest_lang)
+            translated.update(fresh)
+
+        if progress_callback:
+            progress_callback(100)
+        return translated
+
+    def _traced_batch(self, batch_texts, dest_lang):
+        with stage("translate_batch", lang=dest_lang, items=len(batch_texts),
+                   chars=sum(len(t) for t in batch_texts)):
+            return self._translate_batch(batch_texts, dest_lang)
+
+    def _translate_batch(self, batch_texts, dest_lang):
+        # Tarjima qilinmagan elementlar uchun None qaytariladi
+        if len(batch_texts) == 1:
+            return [self._call(batch_texts[0], dest_lang) or None]
+
+        translated = self._call(DELIMITER.join(batch_texts), dest_lang)
+        if translated is None:
+            # Xizmat barcha urinishlardan keyin ham javob bermadi - bo'lish yordam bermaydi
+            return [None] * len(batch_texts)
+        parts = split_batch(translated, len(batch_texts))
+        if parts is not None:
+            return parts
+
+        # Ajratkich buzilgan bo'lsa, guruhni ikkiga bo'lib qayta urinib ko'ramiz
+        middle = len(batch_texts) // 2
+        return (self._translate_batch(batch_texts[:middle], dest_lang)
+                + self._translate_batch(batch_texts[middle:], dest_lang))
+
+    def _call(self, text, dest_lang):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                return self.backend.translate(text, dest_lang)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.warning("Tarjima so'rovida xatolik: %s", e)
+                    return None
+                # Eksponensial kutish (jitter bilan)
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+        return None
+
+
+def default_backend():
+    """Sozlamalarga qarab standart tarjima xizmatini tanlash"""
+    if settings.TRANSLATE_BACKEND_URL:
+        return HttpBackend(settings.TRANSLATE_BACKEND_URL)
+    return GoogleBackend()
+
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_default_engine():
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = TranslationEngine(memory=get_translation_memory())
+        return _default_engine
@@ -0,0 +1,53 @@
+import hashlib
+import os
+from collections import namedtuple
+
+from instrumentation import stage
+
+# Diskka bir martada yoziladigan bo'lak hajmi
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Diskka saqlangan fayl: yo'li, hajmi (bayt) va SHA-256 xeshi
+StoredUpload = namedtuple("StoredUpload", ["path", "size", "sha256"])
+
+
+def save_upload(uploaded_file, dest_path, chunk_size=CHUNK_SIZE):
+    """Yuklangan faylni bo'laklab diskka yozish; hajm va xesh shu o'tishda hisoblanadi"""
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = dest_path + ".part"
+
+    uploaded_file.seek(0)
+    try:
+        with stage("upload_write"), open(tmp_path, "wb") as f:
+            while True:
+                chunk = uploaded_file.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        # Yarim yozilgan fayl hech qachon asosiy nom bilan ko'rinmaydi
+        os.replace(tmp_path, dest_path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        uploaded_file.seek(0)
+
+    return StoredUpload(dest_path, size, digest.hexdigest())
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    """Diskdagi faylning SHA-256 xeshini bo'laklab hisoblash"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
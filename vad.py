@@ -0,0 +1,119 @@
+import numpy as np
+
+import settings
+
+# Energiya bo'yicha nutq faolligini aniqlash (VAD): 16 kHz mono float32 audio.
+# Sukunat va juda past shovqin modelga yuborilmaydi, topilgan nutq qismlari
+# esa oraliq bilan ulanib, vaqtlar keyin asl vaqt o'qiga qaytariladi
+
+FRAME_MS = 30
+# Shovqin sathidan shuncha dB baland kadr nutq deb hisoblanadi
+MARGIN_DB = 12.0
+# Chegara shu oraliqda bo'ladi (dBFS): juda jim yozuvda ham, baland fonda ham
+MIN_THRESHOLD_DB = -55.0
+MAX_THRESHOLD_DB = -30.0
+MIN_SPEECH_MS = 250
+MERGE_GAP_MS = 700
+PAD_MS = 300
+# Nutq ulushi bundan yuqori bo'lsa, audio siqilmaydi: yutuq kam, ulanish joylari esa ortadi
+MAX_SPEECH_RATIO = 0.9
+# Qismlar orasidagi sukunat: model qo'shni qismlarni bitta gapga qo'shib yubormasligi uchun
+JOIN_GAP_MS = 300
+
+
+def resolve_vad(vad=None):
+    """VAD yoqilganmi; None berilsa sozlamadan olinadi"""
+    return settings.VAD_ENABLED if vad is None else bool(vad)
+
+
+def frame_energy_db(audio, frame_len):
+    """Har bir kadrning o'rtacha quvvati (dBFS)"""
+    n_frames = len(audio) // frame_len
+    if n_frames == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:n_frames * frame_len].reshape(n_frames, frame_len)
+    power = np.einsum("ij,ij->i", frames, frames) / frame_len
+    return 10.0 * np.log10(power + 1e-10)
+
+
+def _runs(mask):
+    """Mantiqiy massivdagi uzluksiz True oraliqlari: (boshlar, oxirlar)"""
+    padded = np.concatenate(([0], mask.astype(np.int8), [0]))
+    diff = np.diff(padded)
+    return np.flatnonzero(diff == 1), np.flatnonzero(diff == -1)
+
+
+def detect_speech(audio, sample_rate=16000, frame_ms=FRAME_MS, min_speech_ms=MIN_SPEECH_MS,
+                  merge_gap_ms=MERGE_GAP_MS, pad_ms=PAD_MS):
+    """Nutq qismlarini topish; [(boshlanish, tugash)] namunalarda, o'sish tartibida"""
+    frame_len = int(sample_rate * frame_ms / 1000)
+    energy = frame_energy_db(audio, frame_len)
+    if len(energy) == 0:
+        return []
+
+    # Moslashuvchan chegara: eng jim kadrlar shovqin sathini belgilaydi
+    noise_floor = np.percentile(energy, 10)
+    threshold = min(max(noise_floor + MARGIN_DB, MIN_THRESHOLD_DB), MAX_THRESHOLD_DB)
+    starts, ends = _runs(energy > threshold)
+    if len(starts) == 0:
+        return []
+
+    # Qisqa pauzalar bilan ajralgan qismlarni birlashtirish
+    merge_gap = merge_gap_ms / frame_ms
+    keep = (starts[1:] - ends[:-1]) >= merge_gap
+    starts = np.concatenate(([starts[0]], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], [ends[-1]]))
+
+    # Juda qisqa portlashlar (chertish, taqillash) tashlanadi
+    long_enough = (ends - starts) * frame_ms >= min_speech_ms
+    starts, ends = starts[long_enough], ends[long_enough]
+    if len(starts) == 0:
+        return []
+
+    # Kadrlardan namunalarga o'tish va so'z boshi/oxiri kesilmasligi uchun chetlarni kengaytirish
+    pad = int(sample_rate * pad_ms / 1000)
+    starts = np.maximum(starts * frame_len - pad, 0)
+    ends = np.minimum(ends * frame_len + pad, len(audio))
+
+    # Kengaytirishdan keyin ustma-ust tushganlarni birlashtirish
+    keep = starts[1:] > ends[:-1]
+    starts = np.concatenate(([starts[0]], starts[1:][keep]))
+    ends = np.concatenate((ends[:-1][keep], [ends[-1]]))
+    return [(int(s), int(e)) for s, e in zip(starts, ends)]
+
+
+def speech_ratio(regions, total_samples):
+    if total_samples <= 0:
+        return 0.0
+    return sum(end - start for start, end in regions) / total_samples
+
+
+class Timeline:
+    """Siqilgan (faqat nutq) audio vaqtlarini asl vaqt o'qiga o'tkazish"""
+
+    def __init__(self, regions, sample_rate=16000, gap_samples=0):
+        self.sample_rate = sample_rate
+        self.original_starts = np.array([s for s, _ in regions], dtype=np.int64)
+        self.lengths = np.array([e - s for s, e in regions], dtype=np.int64)
+        # Siqilgan audioda har bir qism boshlanadigan joy (oraliqlar bilan)
+        self.compact_starts = np.concatenate(([0], np.cumsum(self.lengths + gap_samples)[:-1])).astype(np.int64)
+
+    def to_original(self, seconds):
+        """Siqilgan audiodagi vaqtni (soniya) asl vaqtga o'tkazish"""
+        sample = seconds * self.sample_rate
+        i = max(0, int(np.searchsorted(self.compact_starts, sample, side="right")) - 1)
+        # Qismlar orasidagi sukunatga tushgan vaqt qism oxiriga yopishtiriladi
+        offset = min(max(sample - self.compact_starts[i], 0), self.lengths[i])
+        return (self.original_starts[i] + offset) / self.sample_rate
+
+
+def compact_speech(audio, regions, sample_rate=16000, join_gap_ms=JOIN_GAP_MS):
+    """Nutq qismlarini qisqa sukunat bilan ulash; (siqilgan audio, Timeline) qaytaradi"""
+    gap = int(sample_rate * join_gap_ms / 1000)
+    total = sum(end - start for start, end in regions) + gap * max(0, len(regions) - 1)
+    compact = np.zeros(total, dtype=audio.dtype)
+    position = 0
+    for start, end in regions:
+        compact[position:position + end - start] = audio[start:end]
+        position += end - start + gap
+    return compact, Timeline(regions, sample_rate, gap)
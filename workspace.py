@@ -0,0 +1,208 @@
+import logging
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+
+import settings
+
+logger = logging.getLogger(__name__)
+
+# Fon tozalovchisi ishga tushadigan oraliq (soniya)
+EVICT_INTERVAL = 300
+
+
+class Workspace:
+    """Sessiyalar va vazifalar uchun alohida ishchi kataloglar.
+
+    Tuzilishi: root/<sessiya>/ - yuklangan fayllar, root/<sessiya>/jobs/<vazifa>/ -
+    vazifa natijalari va oraliq fayllari. Fayllarning o'zgartirilgan vaqti
+    oxirgi ishlatilgan vaqt sifatida yuritiladi (touch). Tozalovchi TTL dan
+    eski fayllarni va umumiy disk byudjetidan oshgan eng eski fayllarni
+    o'chiradi; vazifasi ishlayotgan sessiyaga tegilmaydi.
+    """
+
+    def __init__(self, root, max_bytes, ttl_seconds):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # Ishlayotgan vazifalar soni: sessiya katalogi bo'yicha
+        self._active = {}
+        # Vazifalar tugashini kutayotgan tozalash so'rovlari: sessiya katalogi -> so'rov vaqti
+        self._pending_clear = {}
+        self._wake = threading.Event()
+        self._janitor = None
+        os.makedirs(root, exist_ok=True)
+
+    def session_dir(self, session_id):
+        path = os.path.join(self.root, session_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def job_dir(self, session_id, job_id):
+        path = os.path.join(self.session_dir(session_id), "jobs", job_id)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    @contextmanager
+    def job(self, session_id, job_id):
+        """Vazifa katalogi; vazifa ishlayotganda sessiya fayllari o'chirilmaydi"""
+        session_path = self.session_dir(session_id)
+        with self._lock:
+            self._active[session_path] = self._active.get(session_path, 0) + 1
+        try:
+            yield self.job_dir(session_id, job_id)
+        finally:
+            cleared_at = None
+            with self._lock:
+                count = self._active.pop(session_path) - 1
+                if count:
+                    self._active[session_path] = count
+                else:
+                    cleared_at = self._pending_clear.pop(session_path, None)
+            if cleared_at is not None:
+                _remove_older(session_path, cleared_at)
+            self.request_eviction()
+
+    def touch(self, *paths):
+        """Fayllarni yaqinda ishlatilgan deb belgilash (LRU uchun)"""
+        for path in paths:
+            if path:
+                try:
+                    os.utime(path, None)
+                except OSError:
+                    pass
+
+    def clear_session(self, session_id):
+        """Sessiyaning barcha fayllarini o'chirish.
+
+        Vazifasi ishlayotgan sessiyada vazifa hali o'qiydigan fayllar (yuklangan
+        video, tarjima holati) bor, shuning uchun tozalash oxirgi vazifa
+        tugaguncha kechiktiriladi. Shunda so'rovdan keyin yaratilgan fayllar
+        (yangi yuklashlar, vazifa natijalari) qoladi.
+        """
+        path = os.path.join(self.root, session_id)
+        with self._lock:
+            if path in self._active:
+                self._pending_clear.setdefault(path, time.time())
+                return
+        shutil.rmtree(path, ignore_errors=True)
+
+    def usage(self):
+        """Ishchi kataloglardagi fayllar: [(oxirgi ishlatilgan vaqt, hajm, yo'l, sessiya katalogi)]"""
+        files = []
+        for session_name in os.listdir(self.root):
+            session_path = os.path.join(self.root, session_name)
+            for dirpath, _, filenames in os.walk(session_path):
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path, session_path))
+        return files
+
+    def evict(self):
+        """Muddati o'tgan va byudjetdan oshgan eng eski fayllarni o'chirish"""
+        with self._lock:
+            active = set(self._active)
+        now = time.time()
+        files = self.usage()
+        total = sum(size for _, size, _, _ in files)
+        removed = 0
+
+        for used, size, path, session_path in sorted(files):
+            if session_path in active:
+                continue
+            if used > now - self.ttl_seconds and total <= self.max_bytes:
+                break
+            if _remove(path):
+                total -= size
+                removed += 1
+
+        # Bo'sh qolgan vazifa va sessiya kataloglari
+        for session_name in os.listdir(self.root):
+            session_path = os.path.join(self.root, session_name)
+            if session_path not in active:
+                _prune_empty_dirs(session_path, now - self.ttl_seconds)
+
+        if removed:
+            logger.info("Ishchi katalogdan %d ta fayl o'chirildi, band joy: %.0f MB", removed, total / 2**20)
+        if total > self.max_bytes:
+            logger.warning("Ishchi katalog byudjetdan oshgan (%.0f MB): faol vazifalar fayllari", total / 2**20)
+        return removed
+
+    def request_eviction(self):
+        """Tozalashni fonda boshlash (chaqiruvchini to'xtatmaydi)"""
+        self._wake.set()
+
+    def start_janitor(self, interval=EVICT_INTERVAL):
+        """Davriy va so'rov bo'yicha tozalovchi fon oqimini ishga tushirish (bir marta)"""
+        with self._lock:
+            if self._janitor is not None:
+                return
+            self._janitor = threading.Thread(target=self._run_janitor, args=(interval,),
+                                             name="workspace-janitor", daemon=True)
+        self._janitor.start()
+
+    def _run_janitor(self, interval):
+        while True:
+            try:
+                self.evict()
+            except Exception as e:
+                logger.warning("Ishchi katalogni tozalashda xatolik: %s", e)
+            self._wake.wait(interval)
+            self._wake.clear()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+
+def _remove_older(root, before):
+    # Kechiktirilgan tozalash: so'rovdan oldin oxirgi marta ishlatilgan fayllar
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                if os.path.getmtime(path) <= before:
+                    os.remove(path)
+            except OSError:
+                pass
+    _prune_empty_dirs(root, before)
+
+
+def _prune_empty_dirs(root, older_than):
+    # Ichki kataloglardan boshlab; sessiya katalogi faqat uzoq ishlatilmagan bo'lsa o'chiriladi
+    for dirpath, _, _ in os.walk(root, topdown=False):
+        try:
+            if dirpath == root and os.path.getmtime(dirpath) > older_than:
+                continue
+            os.rmdir(dirpath)
+        except OSError:
+            pass
+
+
+_workspace = None
+_workspace_lock = threading.Lock()
+
+
+def get_workspace():
+    """Jarayon bo'yicha umumiy ishchi katalog (birinchi chaqiruvda tozalovchi ham ishga tushadi)"""
+    global _workspace
+    with _workspace_lock:
+        if _workspace is None:
+            _workspace = Workspace(
+                settings.WORKSPACE_DIR,
+                settings.WORKSPACE_MAX_MB * 1024 * 1024,
+                settings.WORKSPACE_TTL_HOURS * 3600,
+            )
+            _workspace.start_janitor()
+        return _workspace